@@ -1,7 +1,20 @@
-import json
 import os
+import sys
 from typing import Dict, Any
 
+# Vendored copy of backend/shared (tools/vendor_shared.py): each function is deployed on its own
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared'))
+from runtime import (cors_headers, preflight, json_response, error_response,
+                     method_not_allowed, get_header, get_config)
+from db import connect_read
+from profiling import profiled
+from tracing import traced, cursor_factory
+
+CORS_HEADERS = cors_headers('GET, OPTIONS', 'Content-Type, X-Admin-Token')
+
+
+@profiled('admin-stats')
+@traced('admin-stats')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Get statistics for admin panel
@@ -12,57 +25,26 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Admin-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return preflight(CORS_HEADERS)
     
     if method != 'GET':
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return method_not_allowed()
     
     try:
-        import psycopg2
+        import psycopg2.extensions
         
-        db_url = os.environ.get('DATABASE_URL')
+        db_url = get_config().database_url
         
         if not db_url:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Database not configured'})
-            }
+            return error_response(500, 'Database not configured')
         
-        headers = event.get('headers', {})
-        admin_token = headers.get('X-Admin-Token') or headers.get('x-admin-token')
+        admin_token = get_header(event, 'X-Admin-Token')
         
         if not admin_token:
-            return {
-                'statusCode': 401,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Admin token required'})
-            }
+            return error_response(401, 'Admin token required')
         
-        conn = psycopg2.connect(db_url)
-        cur = conn.cursor()
+        conn = connect_read()
+        cur = conn.cursor(cursor_factory=cursor_factory(psycopg2.extensions.cursor))
         
         cur.execute('SELECT COUNT(*) FROM users')
         users_count = cur.fetchone()[0]
@@ -133,42 +115,27 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         cur.close()
         conn.close()
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+        return json_response(200, {
+            'users': {
+                'total': users_count,
+                'new_by_day': new_users_by_day
             },
-            'isBase64Encoded': False,
-            'body': json.dumps({
-                'users': {
-                    'total': users_count,
-                    'new_by_day': new_users_by_day
-                },
-                'messages': {
-                    'total': messages_count
-                },
-                'revenue': {
-                    'total': completed_revenue,
-                    'pending': total_revenue - completed_revenue,
-                    'by_package': packages_stats
-                },
-                'purchases': {
-                    'total': total_purchases
-                },
-                'requests': {
-                    'free_used': total_free_used,
-                    'paid_remaining': total_paid_remaining
-                }
-            })
-        }
+            'messages': {
+                'total': messages_count
+            },
+            'revenue': {
+                'total': completed_revenue,
+                'pending': total_revenue - completed_revenue,
+                'by_package': packages_stats
+            },
+            'purchases': {
+                'total': total_purchases
+            },
+            'requests': {
+                'free_used': total_free_used,
+                'paid_remaining': total_paid_remaining
+            }
+        })
         
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': f'Internal error: {str(e)}'})
-        }
\ No newline at end of file
+        return error_response(500, f'Internal error: {str(e)}')
\ No newline at end of file
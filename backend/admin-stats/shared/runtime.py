@@ -0,0 +1,140 @@
+'''
+Business: Shared runtime for backend functions - JSON codec, CORS headers, config, responses
+Args: imported by every backend/*/index.py handler
+Returns: helpers that build platform response dicts without per-request setup
+'''
+
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {value.__class__.__name__} is not JSON serializable')
+
+
+try:
+    import orjson
+
+    def dumps(value: Any) -> str:
+        return orjson.dumps(value, default=_default).decode('utf-8')
+
+    def loads(raw: Any) -> Any:
+        return orjson.loads(raw)
+
+except ImportError:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+    def dumps(value: Any) -> str:
+        return _encoder.encode(value)
+
+    def loads(raw: Any) -> Any:
+        return json.loads(raw)
+
+
+JSON_HEADERS: Dict[str, str] = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+
+def cors_headers(methods: str, allow_headers: str = 'Content-Type') -> Dict[str, str]:
+    '''Build preflight headers once at import time of a handler module.'''
+    return {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': methods,
+        'Access-Control-Allow-Headers': allow_headers,
+        'Access-Control-Max-Age': '86400'
+    }
+
+
+def preflight(headers: Dict[str, str]) -> Dict[str, Any]:
+    return {'statusCode': 200, 'headers': headers.copy(), 'body': ''}
+
+
+def json_response(status: int, payload: Any) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS.copy(),
+        'isBase64Encoded': False,
+        'body': dumps(payload)
+    }
+
+
+def error_response(status: int, message: str, **extra: Any) -> Dict[str, Any]:
+    '''Uniform error envelope: {"error": message, ...extra}.'''
+    payload = {'error': message}
+    payload.update(extra)
+    return json_response(status, payload)
+
+
+_METHOD_NOT_ALLOWED_BODY = dumps({'error': 'Method not allowed'})
+
+
+def method_not_allowed() -> Dict[str, Any]:
+    return {
+        'statusCode': 405,
+        'headers': JSON_HEADERS.copy(),
+        'body': _METHOD_NOT_ALLOWED_BODY
+    }
+
+
+def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    raw = event.get('body') or '{}'
+    data = loads(raw)
+    return data if isinstance(data, dict) else {}
+
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    headers = event.get('headers') or {}
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(name.lower())
+    return value
+
+
+@dataclass(frozen=True)
+class Config:
+    database_url: Optional[str]
+    database_replica_url: Optional[str]
+    replica_max_lag_seconds: float
+    jwt_secret: str
+    openai_api_key: Optional[str]
+    openai_base_url: Optional[str]
+    semantic_cache: bool
+    yookassa_shop_id: Optional[str]
+    yookassa_secret_key: Optional[str]
+    yookassa_timeout: Tuple[float, float]
+    yookassa_max_attempts: int
+    yookassa_deadline: float
+
+
+@lru_cache(maxsize=None)
+def get_config() -> Config:
+    '''Parse the environment once per container; warm invocations reuse it.'''
+    env = os.environ
+    return Config(
+        database_url=env.get('DATABASE_URL') or None,
+        database_replica_url=env.get('DATABASE_REPLICA_URL') or None,
+        replica_max_lag_seconds=float(env.get('REPLICA_MAX_LAG_SECONDS', '5')),
+        jwt_secret=env.get('JWT_SECRET', 'default-secret-change-in-production'),
+        openai_api_key=env.get('OPENAI_API_KEY') or None,
+        openai_base_url=env.get('OPENAI_BASE_URL') or None,
+        semantic_cache=env.get('SEMANTIC_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes'),
+        yookassa_shop_id=env.get('YOOKASSA_SHOP_ID') or None,
+        yookassa_secret_key=env.get('YOOKASSA_SECRET_KEY') or None,
+        yookassa_timeout=(
+            float(env.get('YOOKASSA_CONNECT_TIMEOUT', '3.05')),
+            float(env.get('YOOKASSA_READ_TIMEOUT', '10'))
+        ),
+        yookassa_max_attempts=int(env.get('YOOKASSA_MAX_ATTEMPTS', '3')),
+        yookassa_deadline=float(env.get('YOOKASSA_DEADLINE_SECONDS', '12'))
+    )
@@ -0,0 +1,120 @@
+'''
+Business: Optional compressed storage of message bodies with a shared preset dictionary
+Args: MESSAGE_COMPRESSION=zlib|zstd enables compression on write (default off),
+      MESSAGE_DICT_VERSION picks shared/message_dict_v<N>.txt (default 1),
+      MESSAGE_COMPRESS_MIN_BYTES skips short bodies (default 128)
+Returns: encode(text) -> (content, content_z) for INSERT, decode(content, content_z) -> text for reads
+
+Stored format of content_z: 1 byte codec, 1 byte dictionary version, compressed bytes.
+Codec 3 is a zlib stream (header carries the dictionary's Adler-32, trailer checksums the text) and
+codec 2 a zstd frame with a content checksum, so a wrong or changed dictionary raises instead of
+returning garbage. Reads never depend on the current settings, so rows written under any codec stay readable.
+Dictionary files are immutable once rows reference them: train a new version instead of editing one.
+
+message_dict_v1.txt is a hand-written seed of common reply phrases, not trained on real replies,
+so its savings on production messages are unmeasured. Run bench/message_codec.py --database-url
+before enabling MESSAGE_COMPRESSION, and train a new version with tools/train_message_dict.py.
+'''
+
+import os
+import zlib
+from functools import lru_cache
+from typing import Optional, Tuple
+
+CODEC_ZSTD = 2
+CODEC_ZLIB = 3
+
+DICT_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPRESSION = os.environ.get('MESSAGE_COMPRESSION', '').lower()
+DICT_VERSION = int(os.environ.get('MESSAGE_DICT_VERSION', '1'))
+MIN_BYTES = int(os.environ.get('MESSAGE_COMPRESS_MIN_BYTES', '128'))
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+@lru_cache(maxsize=None)
+def dictionary(version: int) -> bytes:
+    if version == 0:
+        return b''
+    with open(os.path.join(DICT_DIR, f'message_dict_v{version}.txt'), 'rb') as f:
+        # zlib only looks back 32 KiB; the end of the dictionary is the most valuable part
+        return f.read()[-32768:]
+
+
+@lru_cache(maxsize=None)
+def _zstd_dict(version: int) -> Optional['zstandard.ZstdCompressionDict']:
+    if version == 0:
+        return None
+    return zstandard.ZstdCompressionDict(dictionary(version), dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+
+@lru_cache(maxsize=None)
+def _zstd_compressor(version: int, level: int) -> 'zstandard.ZstdCompressor':
+    return zstandard.ZstdCompressor(level=level, dict_data=_zstd_dict(version),
+                                    write_content_size=True, write_checksum=True)
+
+
+@lru_cache(maxsize=None)
+def _zstd_decompressor(version: int) -> 'zstandard.ZstdDecompressor':
+    return zstandard.ZstdDecompressor(dict_data=_zstd_dict(version))
+
+
+def compress(text: str, codec: int = CODEC_ZLIB, version: int = DICT_VERSION, level: int = 6) -> bytes:
+    raw = text.encode('utf-8')
+    if codec == CODEC_ZSTD:
+        body = _zstd_compressor(version, level).compress(raw)
+    else:
+        zdict = dictionary(version)
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY, zdict) if zdict \
+            else zlib.compressobj(level, zlib.DEFLATED, 15)
+        body = compressor.compress(raw) + compressor.flush()
+        codec = CODEC_ZLIB
+    return bytes((codec, version)) + body
+
+
+def decompress(blob: bytes) -> str:
+    blob = bytes(blob)
+    codec, version, body = blob[0], blob[1], blob[2:]
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError('zstandard is required to read zstd-compressed messages')
+        return _zstd_decompressor(version).decompress(body).decode('utf-8')
+    if codec == CODEC_ZLIB:
+        zdict = dictionary(version)
+        decompressor = zlib.decompressobj(15, zdict) if zdict else zlib.decompressobj(15)
+        text = decompressor.decompress(body) + decompressor.flush()
+        if not decompressor.eof:
+            raise zlib.error('Truncated compressed message')
+        return text.decode('utf-8')
+    raise ValueError(f'Unknown message codec {codec}')
+
+
+def write_codec() -> Optional[int]:
+    if COMPRESSION == 'zstd' and zstandard is not None:
+        return CODEC_ZSTD
+    if COMPRESSION in ('zlib', 'zstd'):
+        return CODEC_ZLIB
+    return None
+
+
+def encode(text: str) -> Tuple[Optional[str], Optional[bytes]]:
+    '''Values for the (content, content_z) columns; bodies that do not shrink stay plain.'''
+    codec = write_codec()
+    if codec is None:
+        return text, None
+    size = len(text.encode('utf-8'))
+    if size < MIN_BYTES:
+        return text, None
+    blob = compress(text, codec)
+    if len(blob) >= size:
+        return text, None
+    return None, blob
+
+
+def decode(content: Optional[str], content_z: Optional[bytes]) -> str:
+    if content_z is not None:
+        return decompress(content_z)
+    return content or ''
@@ -0,0 +1,99 @@
+'''
+Business: Opt-in per-invocation profiling of backend handlers with cProfile and tracemalloc
+Args: PROFILE_MODE=cpu|mem|cpu,mem enables it, PROFILE_SAMPLE_RATE (0..1, default 1) samples requests,
+      PROFILE_DIR writes artifacts to files (otherwise they go to the log stream),
+      PROFILE_TOP sets how many functions / allocation sites to report (default 25)
+Returns: decorated handler; the original function object when PROFILE_MODE is unset
+'''
+
+import io
+import os
+import random
+import time
+from functools import wraps
+from typing import Dict, Any, Callable, List
+
+from runtime import dumps
+
+MODES = {mode.strip() for mode in os.environ.get('PROFILE_MODE', '').lower().split(',') if mode.strip()}
+SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '1'))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '')
+TOP = int(os.environ.get('PROFILE_TOP', '25'))
+
+
+def _artifact_name(function: str, context: Any, suffix: str) -> str:
+    request_id = getattr(context, 'request_id', None) or f'{os.getpid()}-{time.time_ns()}'
+    return os.path.join(PROFILE_DIR, f'{function}-{request_id}.{suffix}')
+
+
+def _cpu_report(profiler: Any, function: str, context: Any) -> None:
+    import pstats
+
+    if PROFILE_DIR:
+        profiler.dump_stats(_artifact_name(function, context, 'pstats'))
+        return
+
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(TOP)
+    print(dumps({'event': 'profile_cpu', 'function': function, 'stats': out.getvalue()}))
+
+
+def _mem_report(snapshot: Any, peak: int, function: str, context: Any) -> None:
+    sites: List[Dict[str, Any]] = []
+    for stat in snapshot.statistics('lineno')[:TOP]:
+        frame = stat.traceback[0]
+        sites.append({'site': f'{frame.filename}:{frame.lineno}', 'size': stat.size, 'count': stat.count})
+    report = {'event': 'profile_mem', 'function': function, 'peak_bytes': peak, 'top_sites': sites}
+
+    if PROFILE_DIR:
+        with open(_artifact_name(function, context, 'alloc.json'), 'w', encoding='utf-8') as f:
+            f.write(dumps(report))
+        return
+
+    print(dumps(report))
+
+
+def profiled(function: str) -> Callable:
+    '''
+    Wrap a platform handler so a sampled fraction of invocations run under
+    cProfile and/or tracemalloc. The decision to wrap is taken once at import,
+    so with PROFILE_MODE unset the handler is returned as is.
+    '''
+    def decorate(handler: Callable) -> Callable:
+        if not MODES:
+            return handler
+
+        cpu = 'cpu' in MODES
+        mem = 'mem' in MODES
+        if PROFILE_DIR:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+
+        @wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            if SAMPLE_RATE < 1 and random.random() >= SAMPLE_RATE:
+                return handler(event, context)
+
+            import cProfile
+            import tracemalloc
+
+            profiler = cProfile.Profile() if cpu else None
+            if mem:
+                tracemalloc.start()
+            if profiler:
+                profiler.enable()
+            try:
+                return handler(event, context)
+            finally:
+                if profiler:
+                    profiler.disable()
+                if mem:
+                    snapshot = tracemalloc.take_snapshot()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    _mem_report(snapshot, peak, function, context)
+                if profiler:
+                    _cpu_report(profiler, function, context)
+
+        return wrapper
+
+    return decorate
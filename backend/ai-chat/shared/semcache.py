@@ -0,0 +1,178 @@
+'''
+Business: Semantic near-duplicate reply cache on hashed character n-gram vectors and a NumPy index
+Args: SEMANTIC_CACHE_ENABLED=1 (read through runtime.Config by callers), SEMANTIC_CACHE_THRESHOLD
+      (cosine, default 0.92), SEMANTIC_CACHE_TTL seconds (default 86400),
+      SEMANTIC_CACHE_CAPACITY entries (default 5000), SEMANTIC_CACHE_DIM (default 2048),
+      SEMANTIC_CACHE_MAX_PROMPT longer prompts are never cached (default 300 characters)
+Returns: SemanticCache with lookup(prompt, scope) -> (reply, similarity, cached_prompt) or None
+         and put(prompt, reply, scope)
+
+Entries only match within their scope (one user or guest), so a reply is never served to
+another person. Character n-grams barely move when only a number changes ("500000" vs
+"800000" stays above 0.97) or a short word is added ("Как не написать резюме?" scores 0.926
+against "Как написать резюме?"), so a hit also requires the same numbers in both prompts and
+no differing short word or negation between them.
+
+Experimental: keep it disabled until bench/semcache_replay.py has measured hit and false-positive
+rates on a real message log; so far it has only been replayed on a synthetic one. Scopes are per
+person and each container has its own cache, so only a user repeating themselves on a warm
+container can hit.
+'''
+
+import os
+import re
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+THRESHOLD = float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', '0.92'))
+TTL_SECONDS = float(os.environ.get('SEMANTIC_CACHE_TTL', '86400'))
+CAPACITY = int(os.environ.get('SEMANTIC_CACHE_CAPACITY', '5000'))
+DIM = int(os.environ.get('SEMANTIC_CACHE_DIM', '2048'))
+MAX_PROMPT = int(os.environ.get('SEMANTIC_CACHE_MAX_PROMPT', '300'))
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+# Digit groups like "500 000", "12.5" or "1,5" are one number
+_NUMBER = re.compile(r'\d(?:[\d\s.,]*\d)?')
+# Words that flip or narrow a question's meaning; any other differing word of up to 3 letters counts too
+NEGATIONS = frozenset({'нельзя', 'никогда', 'ничего', 'никак', 'нигде', 'никто',
+                       'never', 'without', 'cannot'})
+SHORT_WORD = 3
+# Rows are allocated on demand, doubling up to the capacity
+INITIAL_ROWS = 64
+
+
+def normalize(text: str) -> str:
+    text = text.lower().replace('ё', 'е')
+    return _SPACES.sub(' ', _NON_WORD.sub(' ', text)).strip()
+
+
+def numbers(text: str) -> Tuple[str, ...]:
+    return tuple(_SPACES.sub('', match).replace(',', '.') for match in _NUMBER.findall(text))
+
+
+def _key(value: str) -> int:
+    return zlib.crc32(value.encode('utf-8'))
+
+
+def same_short_words(a: str, b: str) -> bool:
+    '''False when the prompts differ by a negation or any short word such as "не", "без" or "not".'''
+    differing = set(normalize(a).split()) ^ set(normalize(b).split())
+    return not any(len(word) <= SHORT_WORD or word in NEGATIONS for word in differing)
+
+
+def embed(text: str, dim: int = DIM) -> np.ndarray:
+    '''
+    Signed feature hashing of character 3-grams (with word boundaries) plus whole words,
+    L2-normalised so a dot product is the cosine similarity.
+    '''
+    norm = normalize(text)
+    features: List[str] = norm.split()
+    padded = f' {norm} '
+    features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in features), dtype=np.uint32, count=len(features))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % dim, signs)
+    length = np.linalg.norm(vector)
+    if length:
+        vector /= length
+    return vector
+
+
+class SemanticCache:
+    def __init__(self, capacity: int = CAPACITY, dim: int = DIM,
+                 threshold: float = THRESHOLD, ttl: float = TTL_SECONDS) -> None:
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.ttl = ttl
+        rows = min(capacity, INITIAL_ROWS)
+        self.vectors = np.zeros((rows, dim), dtype=np.float32)
+        self.expires = np.zeros(rows, dtype=np.float64)
+        self.last_used = np.zeros(rows, dtype=np.float64)
+        # crc32 of the scope and of the prompt's numbers; candidates must match both exactly
+        self.scopes = np.zeros(rows, dtype=np.int64)
+        self.number_keys = np.zeros(rows, dtype=np.int64)
+        self.prompts: List[Optional[str]] = [None] * rows
+        self.replies: List[Optional[str]] = [None] * rows
+        self.size = 0
+
+    def _grow(self) -> None:
+        rows = min(self.capacity, 2 * len(self.expires))
+        extra = rows - len(self.expires)
+        self.vectors = np.concatenate([self.vectors, np.zeros((extra, self.dim), dtype=np.float32)])
+        self.expires = np.concatenate([self.expires, np.zeros(extra, dtype=np.float64)])
+        self.last_used = np.concatenate([self.last_used, np.zeros(extra, dtype=np.float64)])
+        self.scopes = np.concatenate([self.scopes, np.zeros(extra, dtype=np.int64)])
+        self.number_keys = np.concatenate([self.number_keys, np.zeros(extra, dtype=np.int64)])
+        self.prompts.extend([None] * extra)
+        self.replies.extend([None] * extra)
+
+    def _nearest(self, vector: np.ndarray, scope: int, number_key: int, now: float) -> Tuple[int, float]:
+        if not self.size:
+            return -1, 0.0
+        scores = self.vectors[:self.size] @ vector
+        scores[(self.expires[:self.size] <= now) | (self.scopes[:self.size] != scope)
+               | (self.number_keys[:self.size] != number_key)] = -1.0
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def lookup(self, prompt: str, scope: str, now: Optional[float] = None) -> Optional[Tuple[str, float, str]]:
+        now = time.time() if now is None else now
+        if len(prompt) > MAX_PROMPT:
+            return None
+        number_key = _key('|'.join(numbers(prompt)))
+        index, score = self._nearest(embed(prompt, self.dim), _key(scope), number_key, now)
+        if index < 0 or score < self.threshold or not same_short_words(prompt, self.prompts[index]):
+            return None
+        self.last_used[index] = now
+        return self.replies[index], score, self.prompts[index]
+
+    def put(self, prompt: str, reply: str, scope: str, now: Optional[float] = None) -> None:
+        # Long prompts carry their own context and are unlikely to repeat
+        if len(prompt) > MAX_PROMPT:
+            return
+        now = time.time() if now is None else now
+        vector = embed(prompt, self.dim)
+        scope_key = _key(scope)
+        number_key = _key('|'.join(numbers(prompt)))
+        index, score = self._nearest(vector, scope_key, number_key, now)
+        if index < 0 or score < 0.999:
+            index = self._free_slot(now)
+        self.vectors[index] = vector
+        self.expires[index] = now + self.ttl
+        self.last_used[index] = now
+        self.scopes[index] = scope_key
+        self.number_keys[index] = number_key
+        self.prompts[index] = prompt
+        self.replies[index] = reply
+
+    def _free_slot(self, now: float) -> int:
+        if self.size < self.capacity:
+            if self.size == len(self.expires):
+                self._grow()
+            self.size += 1
+            return self.size - 1
+        expired = np.flatnonzero(self.expires <= now)
+        if expired.size:
+            return int(expired[0])
+        # Full and nothing expired: evict the least recently used entry
+        return int(np.argmin(self.last_used))
+
+
+_cache: Optional[SemanticCache] = None
+
+
+def get_cache() -> SemanticCache:
+    '''Per-container cache; imported lazily so NumPy only loads when the cache is enabled.'''
+    global _cache
+    if _cache is None:
+        _cache = SemanticCache()
+    return _cache
@@ -0,0 +1,100 @@
+'''
+Business: Throughput of the self-hosted gateway vs single-invocation (cold process per request) mode
+Args: --function, --method, --body, --requests, --concurrency, --workers
+Returns: prints requests/second and latency percentiles for both modes
+'''
+
+import argparse
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SINGLE_INVOCATION = '''
+import importlib.util, sys
+spec = importlib.util.spec_from_file_location('fn', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+module.handler({'httpMethod': sys.argv[2], 'headers': {}, 'body': sys.argv[3]}, None)
+'''
+
+
+def summarize(label: str, latencies: List[float], elapsed: float) -> None:
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+    print(f'{label:<20}{len(ordered) / elapsed:>10.1f} rps   p50 {pick(0.5):7.2f}ms   '
+          f'p95 {pick(0.95):7.2f}ms   p99 {pick(0.99):7.2f}ms')
+
+
+def bench_single(args: argparse.Namespace) -> None:
+    path = os.path.join(BACKEND_DIR, args.function, 'index.py')
+
+    def one(_: int) -> float:
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', SINGLE_INVOCATION, path, args.method, args.body],
+                       check=True, stdout=subprocess.DEVNULL)
+        return time.perf_counter() - started
+
+    count = max(1, args.requests // 10)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        latencies = list(pool.map(one, range(count)))
+    summarize('single-invocation', latencies, time.perf_counter() - started)
+
+
+def bench_gateway(args: argparse.Namespace) -> None:
+    server = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, 'gateway', 'server.py'),
+                               '--port', str(args.port), '--workers', str(args.workers)],
+                              stdout=subprocess.DEVNULL)
+    try:
+        for _ in range(50):
+            try:
+                http.client.HTTPConnection('127.0.0.1', args.port, timeout=1).connect()
+                break
+            except OSError:
+                time.sleep(0.1)
+        time.sleep(0.5)
+
+        body = args.body.encode('utf-8')
+
+        def one(_: int) -> float:
+            started = time.perf_counter()
+            conn = http.client.HTTPConnection('127.0.0.1', args.port, timeout=30)
+            conn.request(args.method, f'/{args.function}', body=body,
+                         headers={'Content-Type': 'application/json'})
+            conn.getresponse().read()
+            conn.close()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            latencies = list(pool.map(one, range(args.requests)))
+        summarize(f'gateway x{args.workers}', latencies, time.perf_counter() - started)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--function', default='payment-webhook')
+    parser.add_argument('--method', default='POST')
+    parser.add_argument('--body', default='{"event": "payment.canceled"}')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--port', type=int, default=18080)
+    args = parser.parse_args()
+
+    bench_single(args)
+    bench_gateway(args)
+
+
+if __name__ == '__main__':
+    main()
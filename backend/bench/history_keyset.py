@@ -0,0 +1,149 @@
+'''
+Business: Latency check of chat-history keyset queries on a scratch copy of messages seeded with millions of rows
+Args: --database-url (a scratch database is best), --table (default messages_bench), --rows (default 3000000),
+      --users, --repeat, --compressed share of seeded rows stored in content_z, --cleanup drops the table
+Returns: prints p50/p95 for first page, deep keyset page, incremental sync and the OFFSET equivalent,
+         plus the EXPLAIN plan of the keyset query
+
+The queries are the handler's own LATEST_SQL / BEFORE_SQL / SINCE_SQL pointed at the scratch table,
+and every fetched page is decoded like the handler does. The real messages table is never written,
+so admin-stats totals are unaffected.
+'''
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+from typing import Callable, List
+
+import psycopg2
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'shared'))
+import msgcodec
+
+PAGE = 50
+
+
+def load_handler_module():
+    spec = importlib.util.spec_from_file_location('chat_history', os.path.join(BACKEND_DIR, 'chat-history', 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def seed(cur, table: str, rows: int, users: int, compressed: float) -> None:
+    # Same columns, constraints and indexes as messages, but ids come from generate_series, not its sequence
+    cur.execute(f'CREATE TABLE IF NOT EXISTS {table} (LIKE messages INCLUDING CONSTRAINTS INCLUDING INDEXES)')
+    cur.execute(f'SELECT COUNT(*) FROM {table}')
+    existing = cur.fetchone()[0]
+    if existing >= rows:
+        print(f'seed: {existing} rows already present in {table}')
+        return
+    started = time.perf_counter()
+    cur.execute(f'''
+        INSERT INTO {table} (id, user_id, role, content, created_at)
+        SELECT g, 1 + (g %% %s),
+               CASE WHEN g %% 2 = 0 THEN 'user' ELSE 'assistant' END,
+               repeat('Пример ответа ассистента ', 1 + (g %% 20)),
+               NOW() - ((%s - g) || ' seconds')::interval
+        FROM generate_series(%s, %s) AS g
+    ''', (users, rows, existing + 1, rows))
+    if compressed > 0:
+        # Every distinct body is compressed once and shared, which is enough to time decoding
+        bodies = {n: msgcodec.compress('Пример ответа ассистента ' * n, msgcodec.CODEC_ZLIB) for n in range(1, 21)}
+        for n, blob in bodies.items():
+            cur.execute(f'''
+                UPDATE {table} SET content = NULL, content_z = %s
+                WHERE id > %s AND 1 + (id %% 20) = %s AND (id::bigint * 7919) %% 1000 < %s
+            ''', (blob, existing, n, int(compressed * 1000)))
+    cur.execute(f'ANALYZE {table}')
+    print(f'seed: inserted {rows - existing} rows into {table} in {time.perf_counter() - started:.1f}s')
+
+
+def measure(label: str, repeat: int, run: Callable[[], None]) -> None:
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    print(f'{label:<28} p50 {samples[len(samples) // 2]:8.2f}ms   p95 {samples[int(len(samples) * 0.95)]:8.2f}ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--table', default='messages_bench')
+    parser.add_argument('--rows', type=int, default=3000000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--compressed', type=float, default=0.5)
+    parser.add_argument('--cleanup', action='store_true')
+    args = parser.parse_args()
+
+    if args.table == 'messages':
+        parser.error('--table must be a scratch table, not messages')
+
+    handler = load_handler_module()
+    retarget = lambda sql: sql.replace(' FROM messages ', f' FROM {args.table} ')
+    latest_sql, before_sql, since_sql = map(retarget, (handler.LATEST_SQL, handler.BEFORE_SQL, handler.SINCE_SQL))
+
+    conn = psycopg2.connect(args.database_url)
+    conn.autocommit = True
+    cur = conn.cursor()
+    seed(cur, args.table, args.rows, args.users, args.compressed)
+
+    def pick_user() -> int:
+        return 1 + random.randrange(args.users)
+
+    def fetch_decoded() -> None:
+        for row in cur.fetchall():
+            handler.decode(row[2], row[3])
+
+    def first_page() -> None:
+        cur.execute(latest_sql, (pick_user(), PAGE + 1))
+        fetch_decoded()
+
+    def deep_keyset() -> None:
+        user_id = pick_user()
+        cur.execute(f'SELECT id FROM {args.table} WHERE user_id = %s ORDER BY id LIMIT 1 OFFSET %s',
+                    (user_id, PAGE))
+        row = cur.fetchone()
+        cur.execute(before_sql, (user_id, row[0] if row else 0, PAGE + 1))
+        fetch_decoded()
+
+    def deep_offset() -> None:
+        user_id = pick_user()
+        cur.execute(f'SELECT COUNT(*) FROM {args.table} WHERE user_id = %s', (user_id,))
+        total = cur.fetchone()[0]
+        cur.execute(latest_sql.replace('LIMIT %s', 'LIMIT %s OFFSET %s'),
+                    (user_id, PAGE, max(0, total - 2 * PAGE)))
+        fetch_decoded()
+
+    def sync_since() -> None:
+        user_id = pick_user()
+        cur.execute(f'SELECT MAX(id) FROM {args.table} WHERE user_id = %s', (user_id,))
+        newest = cur.fetchone()[0] or 0
+        cur.execute(since_sql, (user_id, newest - 4, handler.SYNC_OVERLAP, handler.SYNC_OVERLAP_SECONDS,
+                                user_id, newest - 4, PAGE + 1))
+        fetch_decoded()
+
+    measure('first page (keyset)', args.repeat, first_page)
+    measure('oldest page (keyset)', args.repeat, deep_keyset)
+    measure('oldest page (OFFSET)', args.repeat, deep_offset)
+    measure('incremental sync (since)', args.repeat, sync_since)
+
+    cur.execute('EXPLAIN (ANALYZE, BUFFERS) ' + before_sql, (pick_user(), 2 ** 31 - 1, PAGE + 1))
+    print('\n'.join(row[0] for row in cur.fetchall()))
+
+    if args.cleanup:
+        cur.execute(f'DROP TABLE {args.table}')
+        print(f'cleanup: dropped {args.table}')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''
+Business: Storage savings and read/write overhead of compressed message bodies
+Args: --database-url to sample real assistant replies (otherwise a synthetic Russian corpus), --sample
+Returns: prints stored size ratio and encode/decode time per message for each codec and dictionary
+
+The synthetic corpus is built from the same stock phrases as the hand-written message_dict_v1.txt,
+so its dictionary ratios are a best case; only a --database-url run measures real savings.
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+import msgcodec
+
+SENTENCES = [
+    'Конечно! Вот несколько советов, которые помогут вам начать.',
+    'Во-первых, определите цель и сроки.',
+    'Во-вторых, составьте план и разбейте задачу на небольшие шаги.',
+    'Важно помнить, что результат зависит от регулярности.',
+    'Например, можно выделять по 30 минут каждый день.',
+    'Если нужно, могу объяснить подробнее или привести примеры.',
+    'Таким образом, главное — последовательность и обратная связь.',
+    'Надеюсь, это поможет! Если у вас есть ещё вопросы, спрашивайте.',
+    'Обратите внимание на качество сна и питание.',
+    'Вот пример кода на Python, который решает эту задачу.',
+]
+
+
+def synthetic_corpus(count: int) -> List[str]:
+    rng = random.Random(42)
+    return [' '.join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 40))) for _ in range(count)]
+
+
+def database_corpus(dsn: str, count: int) -> List[str]:
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute("SELECT content, content_z FROM messages WHERE role = 'assistant' AND user_id <> 0 "
+                "ORDER BY id DESC LIMIT %s", (count,))
+    corpus = [msgcodec.decode(content, content_z) for content, content_z in cur.fetchall()]
+    conn.close()
+    return corpus
+
+
+def run(label: str, corpus: List[str], codec: int, version: int) -> None:
+    started = time.perf_counter()
+    blobs = [msgcodec.compress(text, codec, version) for text in corpus]
+    encode_us = (time.perf_counter() - started) / len(corpus) * 1e6
+
+    started = time.perf_counter()
+    for blob in blobs:
+        msgcodec.decompress(blob)
+    decode_us = (time.perf_counter() - started) / len(corpus) * 1e6
+
+    raw = sum(len(text.encode('utf-8')) for text in corpus)
+    # Mirrors encode(): short or incompressible bodies are kept as plain text
+    stored = sum(min(len(blob), len(text.encode('utf-8'))) if len(text.encode('utf-8')) >= msgcodec.MIN_BYTES
+                 else len(text.encode('utf-8')) for text, blob in zip(corpus, blobs))
+    print(f'{label:<16}{stored / raw:>8.3f}{(1 - stored / raw) * 100:>9.1f}%{encode_us:>11.1f}{decode_us:>11.1f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url')
+    parser.add_argument('--sample', type=int, default=5000)
+    parser.add_argument('--dict-version', type=int, default=msgcodec.DICT_VERSION)
+    args = parser.parse_args()
+
+    corpus = database_corpus(args.database_url, args.sample) if args.database_url else synthetic_corpus(args.sample)
+    raw = sum(len(text.encode('utf-8')) for text in corpus)
+    source = 'database' if args.database_url else 'synthetic, dictionary results overstate real savings'
+    print(f'{len(corpus)} messages ({source}), {raw / len(corpus):.0f} bytes average')
+    print(f'{"codec":<16}{"ratio":>8}{"saved":>10}{"enc us":>11}{"dec us":>11}')
+    run('zlib', corpus, msgcodec.CODEC_ZLIB, 0)
+    run('zlib+dict', corpus, msgcodec.CODEC_ZLIB, args.dict_version)
+    if msgcodec.zstandard is not None:
+        run('zstd', corpus, msgcodec.CODEC_ZSTD, 0)
+        run('zstd+dict', corpus, msgcodec.CODEC_ZSTD, args.dict_version)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+'''
+Business: Micro-benchmark of per-request overhead saved by shared/runtime.py
+Args: optional iteration count as argv[1]
+Returns: prints ns per call for the inline handler pattern vs the runtime helpers
+'''
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+import runtime
+
+PAYLOAD = {
+    'reply': 'Привет! Чем могу помочь? ' * 20,
+    'usage': {'free_requests_used': 3, 'paid_requests_available': 40}
+}
+
+
+def inline_response():
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'isBase64Encoded': False,
+        'body': json.dumps(PAYLOAD)
+    }
+
+
+def inline_preflight():
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'POST, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type, X-User-Token',
+            'Access-Control-Max-Age': '86400'
+        },
+        'body': ''
+    }
+
+
+def inline_config():
+    return (
+        os.environ.get('OPENAI_API_KEY'),
+        os.environ.get('DATABASE_URL'),
+        os.environ.get('JWT_SECRET', 'default-secret')
+    )
+
+
+CORS = runtime.cors_headers('POST, OPTIONS', 'Content-Type, X-User-Token')
+
+
+def runtime_config():
+    config = runtime.get_config()
+    return config.openai_api_key, config.database_url, config.jwt_secret
+
+
+CASES = [
+    ('json response', inline_response, lambda: runtime.json_response(200, PAYLOAD)),
+    ('preflight', inline_preflight, lambda: runtime.preflight(CORS)),
+    ('config', inline_config, runtime_config),
+]
+
+
+def main() -> None:
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print('encoder:', 'orjson' if 'orjson' in sys.modules else 'stdlib json')
+    print(f'{"case":<16}{"inline ns":>12}{"runtime ns":>12}{"saved":>10}')
+    for name, before, after in CASES:
+        before_ns = min(timeit.repeat(before, number=number, repeat=3)) / number * 1e9
+        after_ns = min(timeit.repeat(after, number=number, repeat=3)) / number * 1e9
+        print(f'{name:<16}{before_ns:>12.0f}{after_ns:>12.0f}{before_ns - after_ns:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
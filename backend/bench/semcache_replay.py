@@ -0,0 +1,118 @@
+'''
+Business: Offline hit rate and false-positive rate of the semantic reply cache on a replayed message log
+Args: --database-url (user/assistant pairs from messages) or --log file.jsonl with {"prompt", "reply"}
+      and optional "scope" lines, --thresholds, --reply-threshold, --capacity, --ttl
+Returns: prints hit rate, false-positive rate, share of inexact hits and lookup latency per threshold
+
+Judging a hit with the cache's own n-gram embedding would repeat its blind spots, so a hit counts
+as a false positive when the cached reply and the recorded reply cite different numbers, or when
+their word sets overlap (Jaccard) less than --reply-threshold. "inexact" is the share of hits whose
+normalised prompt differs from the cached one - the hits worth sampling by hand.
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+import msgcodec
+from semcache import SemanticCache, normalize, numbers
+
+Pair = Tuple[str, str, str, float]
+
+
+def words(text: str) -> Set[str]:
+    return set(normalize(text).split())
+
+
+def load_database(dsn: str, limit: int) -> List[Pair]:
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    # Pair each user turn with the assistant turn stored right after it for the same user
+    cur.execute('''
+        SELECT q.user_id, q.content, q.content_z, a.content, a.content_z, EXTRACT(EPOCH FROM q.created_at)
+        FROM messages q
+        JOIN LATERAL (
+            SELECT content, content_z, role FROM messages
+            WHERE user_id = q.user_id AND id > q.id ORDER BY id LIMIT 1
+        ) a ON a.role = 'assistant'
+        WHERE q.role = 'user' AND q.user_id <> 0
+        ORDER BY q.id
+        LIMIT %s
+    ''', (limit,))
+    pairs = [(f'user:{user_id}', msgcodec.decode(qc, qz), msgcodec.decode(ac, az), float(ts))
+             for user_id, qc, qz, ac, az, ts in cur.fetchall()]
+    conn.close()
+    return pairs
+
+
+def load_log(path: str, limit: int) -> List[Pair]:
+    pairs = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f):
+            if number >= limit:
+                break
+            record = json.loads(line)
+            pairs.append((record.get('scope', 'log'), record['prompt'], record['reply'],
+                          float(record.get('ts', number))))
+    return pairs
+
+
+def is_false_positive(cached_reply: str, reply: str, reply_threshold: float) -> bool:
+    if numbers(cached_reply) != numbers(reply):
+        return True
+    cached_words, recorded_words = words(cached_reply), words(reply)
+    union = cached_words | recorded_words
+    return bool(union) and len(cached_words & recorded_words) / len(union) < reply_threshold
+
+
+def replay(pairs: List[Pair], threshold: float, args: argparse.Namespace) -> None:
+    cache = SemanticCache(capacity=args.capacity, threshold=threshold, ttl=args.ttl)
+    hits = false_positives = inexact = 0
+    latencies: List[float] = []
+    for scope, prompt, reply, ts in pairs:
+        started = time.perf_counter()
+        found = cache.lookup(prompt, scope, now=ts)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if found:
+            hits += 1
+            false_positives += is_false_positive(found[0], reply, args.reply_threshold)
+            inexact += normalize(found[2]) != normalize(prompt)
+        cache.put(prompt, reply, scope, now=ts)
+
+    latencies.sort()
+    print(f'{threshold:>9.2f}{hits / len(pairs) * 100:>9.1f}%{(false_positives / hits * 100) if hits else 0:>9.1f}%'
+          f'{(inexact / hits * 100) if hits else 0:>9.1f}%'
+          f'{latencies[len(latencies) // 2]:>10.3f}{latencies[int(len(latencies) * 0.99)]:>10.3f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url')
+    parser.add_argument('--log')
+    parser.add_argument('--limit', type=int, default=50000)
+    parser.add_argument('--thresholds', default='0.80,0.85,0.90,0.92,0.95')
+    parser.add_argument('--reply-threshold', type=float, default=0.3, help='minimum word Jaccard of replies')
+    parser.add_argument('--capacity', type=int, default=5000)
+    parser.add_argument('--ttl', type=float, default=86400)
+    args = parser.parse_args()
+
+    if args.log:
+        pairs = load_log(args.log, args.limit)
+    elif args.database_url:
+        pairs = load_database(args.database_url, args.limit)
+    else:
+        parser.error('pass --database-url or --log')
+
+    print(f'{len(pairs)} prompts replayed')
+    print(f'{"threshold":>9}{"hits":>10}{"false+":>10}{"inexact":>10}{"p50 ms":>10}{"p99 ms":>10}')
+    for threshold in (float(value) for value in args.thresholds.split(',')):
+        replay(pairs, threshold, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+'''
+Business: Return a registered user's chat history with keyset pagination and incremental sync
+Args: event with httpMethod GET, headers with X-User-Token,
+      queryStringParameters: before (message id, older page), since (message id, new turns only), limit
+Returns: HTTP response with compact rows [id, role, content, created_at_epoch] in ascending id order
+
+Message ids come from a sequence and are taken before commit, so two turns saved concurrently
+(two open tabs) can become visible out of id order. A since page therefore also repeats the
+user's rows at or below the cursor, but only those among the last SYNC_OVERLAP that were written
+in the last SYNC_OVERLAP_SECONDS, since a turn is committed right after it is inserted. Clients
+merge rows by id.
+'''
+
+import os
+import sys
+import jwt
+from typing import Dict, Any, Optional
+
+# Vendored copy of backend/shared (tools/vendor_shared.py): each function is deployed on its own
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared'))
+from runtime import (cors_headers, preflight, json_response, error_response,
+                     method_not_allowed, get_header, get_config)
+from db import connect_read
+from msgcodec import decode
+from profiling import profiled
+from tracing import traced, cursor_factory
+
+CORS_HEADERS = cors_headers('GET, OPTIONS', 'Content-Type, X-User-Token')
+FIELDS = ['id', 'role', 'content', 'created_at']
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+SYNC_OVERLAP = 20
+SYNC_OVERLAP_SECONDS = 30
+
+COLUMNS = 'id, role, content, content_z, EXTRACT(EPOCH FROM created_at)::bigint'
+# One extra row tells whether another page exists without a COUNT(*)
+LATEST_SQL = f'SELECT {COLUMNS} FROM messages WHERE user_id = %s ORDER BY id DESC LIMIT %s'
+BEFORE_SQL = f'SELECT {COLUMNS} FROM messages WHERE user_id = %s AND id < %s ORDER BY id DESC LIMIT %s'
+SINCE_SQL = (
+    f'(SELECT {COLUMNS} FROM '
+    f'(SELECT * FROM messages WHERE user_id = %s AND id <= %s ORDER BY id DESC LIMIT %s) AS tail '
+    f"WHERE created_at > NOW() - %s * INTERVAL '1 second') "
+    f'UNION ALL '
+    f'(SELECT {COLUMNS} FROM messages WHERE user_id = %s AND id > %s ORDER BY id ASC LIMIT %s)'
+)
+
+
+def _int_param(params: Dict[str, Any], name: str) -> Optional[int]:
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+@profiled('chat-history')
+@traced('chat-history')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
+
+    if method == 'OPTIONS':
+        return preflight(CORS_HEADERS)
+
+    if method != 'GET':
+        return method_not_allowed()
+
+    try:
+        import psycopg2.extensions
+
+        config = get_config()
+        if not config.database_url:
+            return error_response(500, 'Database not configured')
+
+        token = get_header(event, 'X-User-Token')
+        if not token:
+            return error_response(401, 'Authentication required')
+        try:
+            user_id = jwt.decode(token, config.jwt_secret, algorithms=['HS256']).get('user_id')
+        except jwt.PyJWTError:
+            return error_response(401, 'Authentication required')
+        if not user_id:
+            return error_response(401, 'Authentication required')
+
+        params = event.get('queryStringParameters') or {}
+        try:
+            before = _int_param(params, 'before')
+            since = _int_param(params, 'since')
+            limit = _int_param(params, 'limit')
+        except ValueError:
+            return error_response(400, 'before, since and limit must be integers')
+        limit = DEFAULT_LIMIT if limit is None else min(max(limit, 1), MAX_LIMIT)
+
+        if before is not None and since is not None:
+            return error_response(400, 'Use either before or since, not both')
+
+        conn = connect_read()
+        cur = conn.cursor(cursor_factory=cursor_factory(psycopg2.extensions.cursor))
+
+        overlap = []
+        if since is not None:
+            cur.execute(SINCE_SQL, (user_id, since, SYNC_OVERLAP, SYNC_OVERLAP_SECONDS,
+                                    user_id, since, limit + 1))
+            fetched = cur.fetchall()
+            overlap = sorted((row for row in fetched if row[0] <= since), key=lambda row: row[0])
+            rows = [row for row in fetched if row[0] > since]
+        elif before is not None:
+            cur.execute(BEFORE_SQL, (user_id, before, limit + 1))
+            rows = cur.fetchall()
+        else:
+            cur.execute(LATEST_SQL, (user_id, limit + 1))
+            rows = cur.fetchall()
+
+        cur.close()
+        conn.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if since is None:
+            rows.reverse()
+
+        # Only the latest page and sync pages advance the client's sync cursor; the overlap never does
+        cursor = None if before is not None else (rows[-1][0] if rows else since)
+        items = [[row[0], row[1], decode(row[2], row[3]), row[4]] for row in overlap + rows]
+
+        return json_response(200, {
+            'fields': FIELDS,
+            'items': items,
+            'has_more': has_more,
+            'next_before': rows[0][0] if rows and has_more and since is None else None,
+            'cursor': cursor
+        })
+
+    except Exception as e:
+        return error_response(500, f'Internal error: {str(e)}')
@@ -0,0 +1,274 @@
+'''
+Business: Self-hosted gateway that serves every function from func2url.json on a pre-forked worker pool
+Args: --host, --port, --workers; env DB_POOL_SIZE (default 2 per worker) and the usual function secrets
+      SIGHUP reloads function code with a fresh worker generation, SIGTERM/SIGINT stop gracefully
+Returns: HTTP server; POST /ai-chat or /<func2url id> invokes that function's handler
+'''
+
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+from typing import Dict, Any, Callable, List, Optional
+from urllib.parse import urlsplit, parse_qsl
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNC2URL_PATH = os.path.join(BACKEND_DIR, 'func2url.json')
+
+
+def load_routes() -> Dict[str, Callable]:
+    '''
+    Import each function's index.py; every function is reachable by name and by its URL id.
+    Function directories not deployed yet (absent from func2url.json) are mounted by name only.
+    '''
+    with open(FUNC2URL_PATH, encoding='utf-8') as f:
+        func2url = json.load(f)
+    for name in sorted(os.listdir(BACKEND_DIR)):
+        if name not in func2url and os.path.isfile(os.path.join(BACKEND_DIR, name, 'index.py')):
+            func2url[name] = name
+
+    routes: Dict[str, Callable] = {}
+    for name, url in func2url.items():
+        path = os.path.join(BACKEND_DIR, name, 'index.py')
+        spec = importlib.util.spec_from_file_location(f'function_{name.replace("-", "_")}', path)
+        module = importlib.util.module_from_spec(spec)
+        try:
+            spec.loader.exec_module(module)
+        except ImportError as e:
+            print(f'gateway: skipping {name}: {e}', file=sys.stderr, flush=True)
+            continue
+        routes[name] = module.handler
+        routes[url.rstrip('/').rsplit('/', 1)[-1]] = module.handler
+    return routes
+
+
+def make_event(method: str, raw_path: str, headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+    url = urlsplit(raw_path)
+    try:
+        text_body, is_base64 = body.decode('utf-8'), False
+    except UnicodeDecodeError:
+        text_body, is_base64 = base64.b64encode(body).decode('ascii'), True
+    return {
+        'httpMethod': method,
+        'headers': headers,
+        'queryStringParameters': dict(parse_qsl(url.query)),
+        'path': url.path,
+        'body': text_body,
+        'isBase64Encoded': is_base64,
+        'requestContext': {'requestId': str(uuid.uuid4()), 'httpMethod': method}
+    }
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    routes: Dict[str, Callable] = {}
+
+    def _invoke(self) -> None:
+        parts = urlsplit(self.path).path.strip('/').split('/', 1)
+        handler = self.routes.get(parts[0])
+        if handler is None:
+            self._send(404, {'Content-Type': 'application/json'}, b'{"error":"Function not found"}')
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        event = make_event(self.command, self.path, dict(self.headers.items()), body)
+        context = SimpleNamespace(request_id=event['requestContext']['requestId'], function_name=parts[0])
+
+        try:
+            response = handler(event, context)
+        except Exception as e:
+            self._send(502, {'Content-Type': 'application/json'},
+                       json.dumps({'error': f'Handler crashed: {e}'}).encode('utf-8'))
+            return
+
+        payload = response.get('body') or ''
+        if response.get('isBase64Encoded'):
+            raw = base64.b64decode(payload)
+        else:
+            raw = payload.encode('utf-8') if isinstance(payload, str) else json.dumps(payload).encode('utf-8')
+        self._send(int(response.get('statusCode', 200)), response.get('headers') or {}, raw)
+
+    def _send(self, status: int, headers: Dict[str, str], raw: bytes) -> None:
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, str(value))
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_PATCH = do_OPTIONS = _invoke
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return None
+
+
+def run_worker(sock: socket.socket) -> None:
+    '''Serve requests from the shared listening socket until SIGTERM, finishing the one in flight.'''
+    running = True
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal running
+        running = False
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    GatewayHandler.routes = load_routes()
+    server = HTTPServer(sock.getsockname(), GatewayHandler, bind_and_activate=False)
+    # Workers race for each connection; a loser must not block in accept() past SIGTERM
+    sock.setblocking(False)
+    server.socket = sock
+    server.timeout = 0.5
+    while running:
+        server.handle_request()
+
+    import db
+    db.close_all()
+
+
+class Master:
+    # A worker that dies sooner than this after its fork failed to start, not crashed while serving
+    STARTUP_SECONDS = 2.0
+    MAX_BACKOFF_SECONDS = 30.0
+    MAX_STARTUP_FAILURES = 5
+
+    def __init__(self, sock: socket.socket, workers: int) -> None:
+        self.sock = sock
+        self.workers = workers
+        self.generation: List[int] = []
+        self.retiring: List[int] = []
+        self.started_at: Dict[int, float] = {}
+        self.startup_failures = 0
+        self.respawn_at = 0.0
+        self.reload_requested = False
+        self.stopping = False
+        self.failed = False
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                run_worker(self.sock)
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                sys.stderr.flush()
+                os._exit(status)
+        self.started_at[pid] = time.monotonic()
+        return pid
+
+    def reload(self) -> None:
+        '''Start a new generation first, then let the old one drain and exit.'''
+        old = self.generation
+        self.generation = [self.spawn() for _ in range(self.workers)]
+        for pid in old:
+            os.kill(pid, signal.SIGTERM)
+        self.retiring.extend(old)
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            started_at = self.started_at.pop(pid, 0.0)
+            if pid in self.retiring:
+                self.retiring.remove(pid)
+            elif pid in self.generation:
+                self.generation.remove(pid)
+                self.record_exit(pid, status, time.monotonic() - started_at)
+
+    def record_exit(self, pid: int, status: int, lifetime: float) -> None:
+        '''Count workers that die during startup; give up on repeated failures instead of fork-looping.'''
+        code = os.waitstatus_to_exitcode(status)
+        if self.stopping:
+            return
+        if lifetime >= self.STARTUP_SECONDS:
+            self.startup_failures = 0
+            return
+        self.startup_failures += 1
+        if self.startup_failures >= self.MAX_STARTUP_FAILURES:
+            print(f'gateway: worker {pid} failed to start (exit {code}) {self.startup_failures} times in a row, '
+                  f'stopping', file=sys.stderr, flush=True)
+            self.failed = True
+            self.stopping = True
+            return
+        delay = min(self.MAX_BACKOFF_SECONDS, 0.5 * 2 ** (self.startup_failures - 1))
+        print(f'gateway: worker {pid} exited during startup (exit {code}), respawning in {delay:.1f}s',
+              file=sys.stderr, flush=True)
+        self.respawn_at = time.monotonic() + delay
+
+    def respawn(self) -> None:
+        if not self.stopping and time.monotonic() >= self.respawn_at:
+            while len(self.generation) < self.workers:
+                self.generation.append(self.spawn())
+
+    def run(self) -> None:
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, 'reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, 'stopping', True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, 'stopping', True))
+
+        self.generation = [self.spawn() for _ in range(self.workers)]
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            self.reap()
+            self.respawn()
+            time.sleep(0.2)
+
+        for pid in self.generation + self.retiring:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in self.generation + self.retiring:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+
+def listen(host: str, port: int, backlog: int = 512) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Serve backend functions from func2url.json')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args(argv)
+
+    # Handlers import shared modules by path; workers keep a few warm connections each
+    sys.path.insert(0, os.path.join(BACKEND_DIR, 'shared'))
+    os.environ.setdefault('DB_POOL_SIZE', '2')
+
+    sock = listen(args.host, args.port)
+    print(f'gateway: {args.workers} workers on http://{args.host}:{args.port} (pid {os.getpid()})', flush=True)
+    master = Master(sock, args.workers)
+    master.run()
+    if master.failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+'''
+Business: Async load generator replaying mixed guest/registered chat traffic with quota exhaustion and top-ups
+Args: --target gateway URL, --database-url, --jwt-secret, --users, --guest-ratio, --topup-requests,
+      --per-user-parallelism (>1 sends one user's requests concurrently to probe quota races)
+Returns: report with throughput, latency percentiles per endpoint, DB connection counts and quota violations
+
+Typical run against the local stack:
+    python backend/loadtest/llm_stub.py --latency-ms 600 &
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8099/v1 DATABASE_URL=... \\
+        python backend/gateway/server.py --workers 64 &
+    python backend/loadtest/driver.py --database-url ... --users 200
+'''
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+GUEST_LIMIT = 10
+FREE_LIMIT = 15
+PROMPTS = [
+    'Как написать резюме?', 'Объясни квантовую запутанность простыми словами',
+    'Составь план тренировок на неделю', 'Переведи на английский: доброе утро',
+    'Что почитать по Python?', 'Придумай название для кофейни'
+]
+
+
+@dataclass
+class Stats:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: Dict[str, Dict[int, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+    violations: List[str] = field(default_factory=list)
+    guest_answers: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    db_connections: List[int] = field(default_factory=list)
+
+
+class Client:
+    '''Minimal asyncio HTTP/1.0 client; one connection per request, like a browser hitting the platform.'''
+
+    def __init__(self, target: str, stats: Stats) -> None:
+        url = urlsplit(target)
+        self.host = url.hostname or '127.0.0.1'
+        self.port = url.port or 80
+        self.stats = stats
+
+    async def post(self, endpoint: str, payload: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, Any]]:
+        body = json.dumps(payload).encode('utf-8')
+        lines = [f'POST /{endpoint} HTTP/1.0', f'Host: {self.host}', 'Content-Type: application/json',
+                 f'Content-Length: {len(body)}']
+        lines += [f'{key}: {value}' for key, value in (headers or {}).items()]
+        started = time.perf_counter()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        elapsed = time.perf_counter() - started
+
+        head, _, content = raw.partition(b'\r\n\r\n')
+        status = int(head.split(b' ', 2)[1]) if head else 0
+        self.stats.latencies[endpoint].append(elapsed)
+        self.stats.statuses[endpoint][status] += 1
+        try:
+            return status, json.loads(content or b'{}')
+        except ValueError:
+            return status, {}
+
+
+class Database:
+    '''Synchronous psycopg2 helpers run in worker threads so they never block the event loop.'''
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+
+    def _run(self, query: str, params: tuple = (), fetch: bool = True) -> Any:
+        import psycopg2
+        conn = psycopg2.connect(self.dsn)
+        try:
+            cur = conn.cursor()
+            cur.execute(query, params)
+            result = cur.fetchall() if fetch else None
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+    async def query(self, query: str, params: tuple = (), fetch: bool = True) -> Any:
+        return await asyncio.to_thread(self._run, query, params, fetch)
+
+
+async def create_user(db: Database, run_id: str, index: int) -> int:
+    rows = await db.query(
+        "INSERT INTO users (username, password_hash, full_name) VALUES (%s, '!', 'load test') RETURNING id",
+        (f'lt_{run_id}_{index}',)
+    )
+    return rows[0][0]
+
+
+async def send_batch(client: Client, count: int, parallelism: int, payload: Dict[str, Any],
+                     headers: Optional[Dict[str, str]] = None) -> List[int]:
+    semaphore = asyncio.Semaphore(parallelism)
+
+    async def one() -> int:
+        async with semaphore:
+            status, _ = await client.post('ai-chat', dict(payload, message=random.choice(PROMPTS)), headers)
+            return status
+
+    return await asyncio.gather(*(one() for _ in range(count)))
+
+
+async def guest_user(client: Client, stats: Stats, args: argparse.Namespace, run_id: str, index: int) -> None:
+    # ai-chat counts guests with LIKE 'guest:<id>%': ids must not be prefixes of each other and must
+    # not contain the '_' wildcard after the required 'guest_' prefix, hence fixed width and a terminator
+    guest_id = f'guest_{run_id}-{index:06d}-'
+    statuses = await send_batch(client, GUEST_LIMIT + args.overshoot, args.per_user_parallelism,
+                                {'user_id': guest_id})
+    answered = statuses.count(200)
+    stats.guest_answers[answered] += 1
+    if answered != GUEST_LIMIT:
+        stats.violations.append(f'{guest_id}: {answered} answers, expected {GUEST_LIMIT}')
+
+
+async def registered_user(client: Client, db: Database, stats: Stats, args: argparse.Namespace,
+                          run_id: str, index: int) -> None:
+    import jwt
+
+    user_id = await create_user(db, run_id, index)
+    token = jwt.encode({'user_id': user_id, 'exp': int(time.time()) + 3600}, args.jwt_secret, algorithm='HS256')
+    headers = {'X-User-Token': token}
+    payload = {'user_id': str(user_id)}
+
+    statuses = await send_batch(client, FREE_LIMIT + args.overshoot, args.per_user_parallelism, payload, headers)
+    answered = statuses.count(200)
+    if answered != FREE_LIMIT:
+        stats.violations.append(f'user {user_id}: {answered} free answers, expected {FREE_LIMIT}')
+
+    if args.topup_requests:
+        payment_id = f'lt-{uuid.uuid4()}'
+        await db.query(
+            "INSERT INTO purchases (user_id, package_type, amount, requests_count, status, payment_id) "
+            "VALUES (%s, 'loadtest', 0, %s, 'pending', %s)",
+            (user_id, args.topup_requests, payment_id), fetch=False
+        )
+        notification = {
+            'event': 'payment.succeeded',
+            'object': {'id': payment_id, 'status': 'succeeded',
+                       'metadata': {'user_id': str(user_id), 'requests_count': str(args.topup_requests)}}
+        }
+        # YooKassa may deliver a notification more than once; both copies race here on purpose
+        await asyncio.gather(client.post('payment-webhook', notification),
+                             client.post('payment-webhook', notification))
+
+        statuses = await send_batch(client, args.topup_requests + args.overshoot, args.per_user_parallelism,
+                                    payload, headers)
+        paid = statuses.count(200)
+        if paid != args.topup_requests:
+            stats.violations.append(f'user {user_id}: {paid} paid answers, expected {args.topup_requests}')
+        answered += paid
+
+    rows = await db.query(
+        "SELECT u.free_requests_used, u.paid_requests_available, "
+        "(SELECT COUNT(*) FROM messages m WHERE m.user_id = u.id) FROM users u WHERE u.id = %s",
+        (user_id,)
+    )
+    free_used, paid_left, stored = rows[0]
+    if free_used > FREE_LIMIT or paid_left < 0:
+        stats.violations.append(f'user {user_id}: counters free={free_used} paid={paid_left}')
+    if stored != answered * 2:
+        stats.violations.append(f'user {user_id}: {stored} stored messages for {answered} answers')
+
+
+async def sample_connections(db: Database, stats: Stats, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        rows = await db.query('SELECT COUNT(*) FROM pg_stat_activity WHERE datname = current_database()')
+        stats.db_connections.append(rows[0][0])
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+def report(stats: Stats, elapsed: float) -> Dict[str, Any]:
+    endpoints = {}
+    total = 0
+    for endpoint, values in stats.latencies.items():
+        ordered = sorted(values)
+        total += len(ordered)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 1)
+        endpoints[endpoint] = {
+            'requests': len(ordered),
+            'statuses': dict(stats.statuses[endpoint]),
+            'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'max_ms': pick(1.0)
+        }
+    connections = stats.db_connections or [0]
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0,
+        'endpoints': endpoints,
+        'db_connections': {'max': max(connections), 'avg': round(sum(connections) / len(connections), 1)},
+        'quota_violations': len(stats.violations),
+        'violation_samples': stats.violations[:20],
+        'guest_answers': dict(sorted(stats.guest_answers.items()))
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    stats = Stats()
+    client = Client(args.target, stats)
+    db = Database(args.database_url)
+    run_id = uuid.uuid4().hex[:8]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_connections(db, stats, stop))
+
+    users = []
+    for index in range(args.users):
+        if random.random() < args.guest_ratio:
+            users.append(guest_user(client, stats, args, run_id, index))
+        else:
+            users.append(registered_user(client, db, stats, args, run_id, index))
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*users, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+
+    for result in results:
+        if isinstance(result, Exception):
+            stats.violations.append(f'virtual user crashed: {result!r}')
+    return report(stats, elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Concurrent chat/quota load test')
+    parser.add_argument('--target', default='http://127.0.0.1:8000')
+    parser.add_argument('--database-url', required=True)
+    parser.add_argument('--jwt-secret', default='default-secret-change-in-production')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--guest-ratio', type=float, default=0.5)
+    parser.add_argument('--overshoot', type=int, default=3, help='requests sent past each limit')
+    parser.add_argument('--topup-requests', type=int, default=5)
+    parser.add_argument('--per-user-parallelism', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    print(json.dumps(asyncio.run(run(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+'''
+Business: Local OpenAI-compatible chat completions stub with configurable latency, token rate and errors
+Args: --port, --latency-dist fixed|uniform|lognormal, --latency-ms, --latency-spread, --tokens-per-second,
+      --reply-tokens, --error-rate, --error-status, --hang-rate; clients point OPENAI_BASE_URL at http://host:port/v1
+Returns: POST /v1/chat/completions answered like the OpenAI API, with SSE chunks when "stream": true
+'''
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Dict, Any, Tuple
+
+WORDS = ('Конечно', 'вот', 'подробный', 'ответ', 'на', 'ваш', 'вопрос', 'с', 'примерами', 'и', 'пояснениями')
+
+
+class Stub:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.served = 0
+        self.failed = 0
+
+    def first_token_delay(self) -> float:
+        base = self.args.latency_ms / 1000
+        spread = self.args.latency_spread
+        if self.args.latency_dist == 'uniform':
+            return random.uniform(max(0.0, base * (1 - spread)), base * (1 + spread))
+        if self.args.latency_dist == 'lognormal':
+            return random.lognormvariate(math.log(base), spread) if base > 0 else 0.0
+        return base
+
+    def reply_tokens(self) -> list:
+        return [random.choice(WORDS) for _ in range(self.args.reply_tokens)]
+
+    async def completion(self, request: Dict[str, Any]) -> Tuple[int, Dict[str, str], Any]:
+        roll = random.random()
+        if roll < self.args.hang_rate:
+            await asyncio.sleep(3600)
+        if roll < self.args.hang_rate + self.args.error_rate:
+            self.failed += 1
+            body = {'error': {'message': 'Injected failure', 'type': 'server_error', 'code': None}}
+            return self.args.error_status, {'Content-Type': 'application/json'}, json.dumps(body)
+
+        await asyncio.sleep(self.first_token_delay())
+        tokens = self.reply_tokens()
+        model = request.get('model', 'gpt-4o-mini')
+        completion_id = f'chatcmpl-{uuid.uuid4().hex[:24]}'
+        created = int(time.time())
+        token_delay = 1 / self.args.tokens_per_second if self.args.tokens_per_second > 0 else 0
+        self.served += 1
+
+        if request.get('stream'):
+            async def chunks():
+                for index, token in enumerate(tokens):
+                    delta = {'content': (' ' if index else '') + token}
+                    if index == 0:
+                        delta['role'] = 'assistant'
+                    yield {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                           'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]}
+                    await asyncio.sleep(token_delay)
+                yield {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                       'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+            return 200, {'Content-Type': 'text/event-stream'}, chunks()
+
+        await asyncio.sleep(token_delay * len(tokens))
+        prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in request.get('messages', []))
+        return 200, {'Content-Type': 'application/json'}, json.dumps({
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': created,
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ' '.join(tokens)},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(tokens),
+                'total_tokens': prompt_tokens + len(tokens)
+            }
+        }, ensure_ascii=False)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                lines = head.decode('latin-1').split('\r\n')
+                method, path, _ = lines[0].split(' ', 2)
+                headers = {k.strip().lower(): v.strip() for k, v in
+                           (line.split(':', 1) for line in lines[1:] if ':' in line)}
+                raw = await reader.readexactly(int(headers.get('content-length', 0)))
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                if method == 'POST' and path.rstrip('/').endswith('/chat/completions'):
+                    status, out_headers, body = await self.completion(json.loads(raw or b'{}'))
+                else:
+                    status, out_headers, body = 404, {'Content-Type': 'application/json'}, '{"error": "not found"}'
+
+                if isinstance(body, str):
+                    data = body.encode('utf-8')
+                    writer.write(self._head(status, out_headers, keep_alive, f'Content-Length: {len(data)}') + data)
+                    await writer.drain()
+                else:
+                    writer.write(self._head(status, out_headers, False, 'Cache-Control: no-cache'))
+                    async for chunk in body:
+                        writer.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+                        await writer.drain()
+                    writer.write(b'data: [DONE]\n\n')
+                    await writer.drain()
+                    break
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _head(status: int, headers: Dict[str, str], keep_alive: bool, extra: str) -> bytes:
+        lines = [f'HTTP/1.1 {status} {"OK" if status < 400 else "Error"}', extra,
+                 f'Connection: {"keep-alive" if keep_alive else "close"}']
+        lines += [f'{key}: {value}' for key, value in headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='OpenAI-compatible stub for load tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-dist', choices=['fixed', 'uniform', 'lognormal'], default='lognormal')
+    parser.add_argument('--latency-ms', type=float, default=400, help='time to first token (median for lognormal)')
+    parser.add_argument('--latency-spread', type=float, default=0.5, help='relative spread (uniform) or sigma (lognormal)')
+    parser.add_argument('--tokens-per-second', type=float, default=80)
+    parser.add_argument('--reply-tokens', type=int, default=60)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='fraction of requests that never answer')
+    return parser
+
+
+async def serve(args: argparse.Namespace) -> None:
+    stub = Stub(args)
+    server = await asyncio.start_server(stub.handle, args.host, args.port, backlog=1024)
+    print(f'llm stub on http://{args.host}:{args.port}/v1', flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(serve(build_parser().parse_args()))
+    except KeyboardInterrupt:
+        pass
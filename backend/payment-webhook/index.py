@@ -1,7 +1,20 @@
-import json
 import os
+import sys
 from typing import Dict, Any
 
+# Vendored copy of backend/shared (tools/vendor_shared.py): each function is deployed on its own
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared'))
+from runtime import (cors_headers, preflight, json_response, error_response,
+                     method_not_allowed, parse_body, get_config)
+from db import connect
+from profiling import profiled
+from tracing import traced, cursor_factory
+
+CORS_HEADERS = cors_headers('POST, OPTIONS', 'Content-Type')
+
+
+@profiled('payment-webhook')
+@traced('payment-webhook')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Handle YooKassa payment webhooks to complete purchases
@@ -10,115 +23,63 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Returns: HTTP response with acknowledgment
     '''
     method: str = event.get('httpMethod', 'GET')
-    
+
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
-    
+        return preflight(CORS_HEADERS)
+
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
-    
+        return method_not_allowed()
+
     try:
-        import psycopg2
-        
-        db_url = os.environ.get('DATABASE_URL')
-        
+        import psycopg2.extensions
+
+        db_url = get_config().database_url
+
         if not db_url:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Database not configured'})
-            }
-        
-        body_data = json.loads(event.get('body', '{}'))
-        
+            return error_response(500, 'Database not configured')
+
+        body_data = parse_body(event)
+
         notification_type = body_data.get('event')
         payment_obj = body_data.get('object', {})
-        
+
         if notification_type != 'payment.succeeded':
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'status': 'ignored'})
-            }
-        
+            return json_response(200, {'status': 'ignored'})
+
         payment_id = payment_obj.get('id')
         payment_status = payment_obj.get('status')
         metadata = payment_obj.get('metadata', {})
-        
+
         user_id = metadata.get('user_id')
         requests_count = int(metadata.get('requests_count', 0))
-        
+
         if not payment_id or not user_id:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Invalid webhook data'})
-            }
-        
-        conn = psycopg2.connect(db_url)
-        cur = conn.cursor()
-        
+            return error_response(400, 'Invalid webhook data')
+
+        conn = connect(db_url)
+        cur = conn.cursor(cursor_factory=cursor_factory(psycopg2.extensions.cursor))
+
         cur.execute('''
             UPDATE purchases
             SET status = %s, completed_at = NOW()
             WHERE payment_id = %s AND status = 'pending'
             RETURNING id
         ''', ('completed', payment_id))
-        
+
         updated = cur.fetchone()
-        
+
         if updated:
             cur.execute('''
                 UPDATE users
                 SET paid_requests_available = paid_requests_available + %s
                 WHERE id = %s
             ''', (requests_count, user_id))
-        
+
         conn.commit()
         cur.close()
         conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'isBase64Encoded': False,
-            'body': json.dumps({'status': 'ok'})
-        }
-        
+
+        return json_response(200, {'status': 'ok'})
+
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': f'Internal error: {str(e)}'})
-        }
\ No newline at end of file
+        return error_response(500, f'Internal error: {str(e)}')
@@ -0,0 +1,214 @@
+'''
+Business: Per-phase latency tracing for backend functions - spans, round-trip counters, Server-Timing
+Args: TRACING_ENABLED=1 turns it on, TRACING_FLUSH_SECONDS sets histogram flush period (default 60)
+Returns: Server-Timing response header, one structured log line per request, periodic histogram lines
+'''
+
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Any, Callable, List, Optional
+
+from runtime import dumps
+
+ENABLED = os.environ.get('TRACING_ENABLED', '').lower() in ('1', 'true', 'yes')
+FLUSH_SECONDS = float(os.environ.get('TRACING_FLUSH_SECONDS', '60'))
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf')]
+
+
+class _Span:
+    __slots__ = ('_trace', '_name', '_started')
+
+    def __init__(self, trace: 'Trace', name: str) -> None:
+        self._trace = trace
+        self._name = name
+
+    def __enter__(self) -> '_Span':
+        self._started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._trace.add(self._name, time.perf_counter_ns() - self._started)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    '''Accumulated span durations (ns) and round-trip counts for one invocation.'''
+
+    __slots__ = ('function', 'durations', 'counts')
+
+    def __init__(self, function: str) -> None:
+        self.function = function
+        self.durations: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {}
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def add(self, name: str, elapsed_ns: int) -> None:
+        self.durations[name] = self.durations.get(name, 0) + elapsed_ns
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def server_timing(self) -> str:
+        parts = []
+        for name, elapsed_ns in self.durations.items():
+            entry = f'{name};dur={elapsed_ns / 1e6:.2f}'
+            if name in self.counts:
+                entry += f';desc="{self.counts[name]} rt"'
+            parts.append(entry)
+        return ', '.join(parts)
+
+
+class _NullTrace:
+    __slots__ = ()
+
+    def span(self, name: str) -> _NullSpan:
+        return _NULL_SPAN
+
+    def count(self, name: str, n: int = 1) -> None:
+        return None
+
+
+_NULL_TRACE = _NullTrace()
+_current: ContextVar[Any] = ContextVar('trace', default=_NULL_TRACE)
+
+_histograms: Dict[str, List[int]] = {}
+_last_flush = time.monotonic()
+
+
+def current() -> Any:
+    return _current.get()
+
+
+def span(name: str) -> Any:
+    return _current.get().span(name)
+
+
+def count(name: str, n: int = 1) -> None:
+    _current.get().count(name, n)
+
+
+def _observe(key: str, elapsed_ms: float) -> None:
+    buckets = _histograms.get(key)
+    if buckets is None:
+        buckets = _histograms[key] = [0] * len(BUCKETS_MS)
+    buckets[bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+
+def _quantile(buckets: List[int], q: float) -> float:
+    target = sum(buckets) * q
+    seen = 0
+    for bound, hits in zip(BUCKETS_MS, buckets):
+        seen += hits
+        if seen >= target:
+            return bound
+    return BUCKETS_MS[-1]
+
+
+def flush() -> None:
+    '''Emit accumulated histograms as one log line per metric and reset them.'''
+    global _last_flush
+    for key, buckets in _histograms.items():
+        print(dumps({
+            'event': 'latency_histogram',
+            'metric': key,
+            'count': sum(buckets),
+            'buckets_ms': [str(bound) for bound in BUCKETS_MS],
+            'hits': buckets,
+            'p50_le_ms': str(_quantile(buckets, 0.5)),
+            'p95_le_ms': str(_quantile(buckets, 0.95)),
+            'p99_le_ms': str(_quantile(buckets, 0.99))
+        }))
+    _histograms.clear()
+    _last_flush = time.monotonic()
+
+
+def _finish(trace: Trace, response: Optional[Dict[str, Any]], total_ns: int) -> None:
+    trace.add('total', total_ns)
+    for name, elapsed_ns in trace.durations.items():
+        _observe(f'{trace.function}.{name}', elapsed_ns / 1e6)
+
+    if isinstance(response, dict):
+        headers = response.setdefault('headers', {})
+        headers['Server-Timing'] = trace.server_timing()
+        headers['Access-Control-Expose-Headers'] = 'Server-Timing'
+
+    print(dumps({
+        'event': 'request_trace',
+        'function': trace.function,
+        'status': response.get('statusCode') if isinstance(response, dict) else None,
+        'spans_ms': {name: round(ns / 1e6, 2) for name, ns in trace.durations.items()},
+        'round_trips': trace.counts
+    }))
+
+    if time.monotonic() - _last_flush >= FLUSH_SECONDS:
+        flush()
+
+
+def traced(function: str) -> Callable:
+    '''
+    Wrap a platform handler in a Trace. When tracing is disabled the handler
+    is returned untouched, so span()/count() calls inside it hit the shared
+    null trace and cost one ContextVar lookup each.
+    '''
+    def decorate(handler: Callable) -> Callable:
+        if not ENABLED:
+            return handler
+
+        @wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            trace = Trace(function)
+            token = _current.set(trace)
+            started = time.perf_counter_ns()
+            response = None
+            try:
+                response = handler(event, context)
+                return response
+            finally:
+                _current.reset(token)
+                _finish(trace, response, time.perf_counter_ns() - started)
+
+        return wrapper
+
+    return decorate
+
+
+_cursor_classes: Dict[type, type] = {}
+
+
+def cursor_factory(base: type) -> type:
+    '''
+    psycopg2 cursor class that times every execute() as a "db" span and counts
+    it as a round trip. Returns the base class itself when tracing is off.
+    '''
+    if not ENABLED:
+        return base
+
+    traced_class = _cursor_classes.get(base)
+    if traced_class is None:
+        def execute(self: Any, query: Any, vars: Any = None) -> Any:
+            trace = _current.get()
+            trace.count('db')
+            with trace.span('db'):
+                return base.execute(self, query, vars)
+
+        traced_class = _cursor_classes[base] = type(f'Traced{base.__name__}', (base,), {'execute': execute})
+    return traced_class
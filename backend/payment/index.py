@@ -1,144 +1,209 @@
-import json
+import hashlib
 import os
+import sys
+import time
 import uuid
+from decimal import Decimal, InvalidOperation
 from typing import Dict, Any
 
+# Vendored copy of backend/shared (tools/vendor_shared.py): each function is deployed on its own
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared'))
+from runtime import (cors_headers, preflight, json_response, error_response,
+                     method_not_allowed, parse_body, get_config)
+from db import connect
+from profiling import profiled
+from tracing import traced, span, count, cursor_factory
+
+CORS_HEADERS = cors_headers('POST, OPTIONS', 'Content-Type, X-User-Id')
+
+YOOKASSA_PAYMENTS_URL = 'https://api.yookassa.ru/v3/payments'
+RETURN_URL = 'https://ai-helper-website.poehali.dev/?payment=success'
+
+# Kept at module level so warm invocations reuse the keep-alive connection
+_session = None
+
+
+def _yookassa_session():
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        _session = requests.Session()
+        _session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+    return _session
+
+
+def _create_yookassa_payment(payload: Dict[str, Any], idempotence_key: str,
+                             shop_id: str, secret_key: str) -> Dict[str, Any]:
+    '''
+    POST the payment to YooKassa, retrying timeouts and 5xx/429 answers.
+    Every attempt carries the same Idempotence-Key, so YooKassa returns the
+    already created payment instead of charging twice. All attempts together
+    stay within YOOKASSA_DEADLINE_SECONDS.
+    '''
+    import requests
+
+    config = get_config()
+    connect_timeout, read_timeout = config.yookassa_timeout
+    deadline = time.monotonic() + config.yookassa_deadline
+    session = _yookassa_session()
+    last_error = 'YooKassa request failed'
+
+    for attempt in range(config.yookassa_max_attempts):
+        if attempt:
+            backoff = 0.2 * 2 ** (attempt - 1)
+            if deadline - time.monotonic() <= backoff:
+                break
+            time.sleep(backoff)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        count('yookassa')
+        try:
+            response = session.post(
+                YOOKASSA_PAYMENTS_URL,
+                json=payload,
+                auth=(shop_id, secret_key),
+                headers={'Idempotence-Key': idempotence_key},
+                timeout=(min(connect_timeout, remaining), min(read_timeout, remaining))
+            )
+        except (requests.Timeout, requests.ConnectionError) as e:
+            last_error = f'YooKassa unavailable: {e.__class__.__name__}'
+            continue
+
+        if response.status_code == 429 or response.status_code >= 500:
+            last_error = f'YooKassa error {response.status_code}'
+            continue
+        if response.status_code >= 400:
+            raise RuntimeError(f'YooKassa rejected payment: {response.text[:200]}')
+        return response.json()
+
+    raise TimeoutError(last_error)
+
+
+@profiled('payment')
+@traced('payment')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
     Business: Create YooKassa payment for AI requests packages
     Args: event with httpMethod, body with user_id, package_type, amount, description
+          and optional idempotence_key for safe client retries
           context with request_id
     Returns: HTTP response with payment URL and payment_id
     '''
     method: str = event.get('httpMethod', 'GET')
-    
+
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
-    
+        return preflight(CORS_HEADERS)
+
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
-    
+        return method_not_allowed()
+
     try:
-        from yookassa import Configuration, Payment
-        import psycopg2
-        
-        shop_id = os.environ.get('YOOKASSA_SHOP_ID')
-        secret_key = os.environ.get('YOOKASSA_SECRET_KEY')
-        db_url = os.environ.get('DATABASE_URL')
-        
+        import psycopg2.extensions
+
+        config = get_config()
+        shop_id = config.yookassa_shop_id
+        secret_key = config.yookassa_secret_key
+        db_url = config.database_url
+
         if not shop_id or not secret_key:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Payment system not configured'})
-            }
-        
+            return error_response(500, 'Payment system not configured')
+
         if not db_url:
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Database not configured'})
-            }
-        
-        Configuration.account_id = shop_id
-        Configuration.secret_key = secret_key
-        
-        body_data = json.loads(event.get('body', '{}'))
+            return error_response(500, 'Database not configured')
+
+        body_data = parse_body(event)
         user_id = body_data.get('user_id')
         package_type = body_data.get('package_type')
         amount = body_data.get('amount')
         description = body_data.get('description', 'Покупка запросов ИИпомогатор')
         requests_count = body_data.get('requests_count')
-        
+
         if not all([user_id, package_type, amount, requests_count]):
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Missing required fields'})
-            }
-        
-        idempotence_key = str(uuid.uuid4())
-        
-        payment = Payment.create({
-            'amount': {
-                'value': str(amount),
-                'currency': 'RUB'
-            },
-            'confirmation': {
-                'type': 'redirect',
-                'return_url': 'https://ai-helper-website.poehali.dev/?payment=success'
-            },
-            'capture': True,
-            'description': description,
-            'metadata': {
-                'user_id': user_id,
-                'package_type': package_type,
-                'requests_count': str(requests_count)
-            }
-        }, idempotence_key)
-        
-        conn = psycopg2.connect(db_url)
-        cur = conn.cursor()
-        
-        cur.execute('''
-            INSERT INTO purchases 
-            (user_id, package_type, requests_count, amount, status, payment_id)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            RETURNING id
-        ''', (user_id, package_type, requests_count, amount, 'pending', payment.id))
-        
-        purchase_id = cur.fetchone()[0]
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'isBase64Encoded': False,
-            'body': json.dumps({
-                'payment_id': payment.id,
-                'payment_url': payment.confirmation.confirmation_url,
-                'purchase_id': purchase_id,
-                'status': payment.status
-            })
-        }
-        
+            return error_response(400, 'Missing required fields')
+
+        try:
+            amount_value = Decimal(str(amount)).quantize(Decimal('0.01'))
+            requests_count = int(requests_count)
+        except (InvalidOperation, ValueError):
+            return error_response(400, 'Invalid amount or requests_count')
+
+        idempotence_key = str(body_data.get('idempotence_key') or uuid.uuid4())[:64]
+        # Keys are chosen by clients, so they are unique per user only; YooKassa keys are per shop
+        yookassa_key = hashlib.sha256(f'{user_id}:{idempotence_key}'.encode('utf-8')).hexdigest()
+
+        conn = connect(db_url)
+
+        try:
+            cur = conn.cursor(cursor_factory=cursor_factory(psycopg2.extensions.cursor))
+            # A repeated key of the same user returns the existing row instead of creating a second purchase
+            cur.execute('''
+                INSERT INTO purchases
+                (user_id, package_type, requests_count, amount, status, idempotence_key)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (user_id, idempotence_key) DO UPDATE SET idempotence_key = EXCLUDED.idempotence_key
+                RETURNING id, payment_id, payment_url, status, package_type, requests_count, amount
+            ''', (user_id, package_type, requests_count, amount_value, 'pending', idempotence_key))
+            (purchase_id, stored_payment_id, stored_payment_url, stored_status,
+             stored_package, stored_count, stored_amount) = cur.fetchone()
+            conn.commit()
+
+            if (stored_package, stored_count, stored_amount) != (package_type, requests_count, amount_value):
+                return error_response(409, 'Idempotence key was already used for a different purchase',
+                                      idempotence_key=idempotence_key)
+
+            if stored_payment_id:
+                return json_response(200, {
+                    'payment_id': stored_payment_id,
+                    'payment_url': stored_payment_url,
+                    'purchase_id': purchase_id,
+                    'status': stored_status
+                })
+
+            try:
+                with span('yookassa'):
+                    payment = _create_yookassa_payment({
+                        'amount': {
+                            'value': str(amount_value),
+                            'currency': 'RUB'
+                        },
+                        'confirmation': {
+                            'type': 'redirect',
+                            'return_url': RETURN_URL
+                        },
+                        'capture': True,
+                        'description': description,
+                        'metadata': {
+                            'user_id': user_id,
+                            'package_type': package_type,
+                            'requests_count': str(requests_count),
+                            'purchase_id': str(purchase_id)
+                        }
+                    }, yookassa_key, shop_id, secret_key)
+            except TimeoutError as e:
+                return error_response(502, str(e), purchase_id=purchase_id,
+                                      idempotence_key=idempotence_key)
+
+            payment_url = (payment.get('confirmation') or {}).get('confirmation_url')
+
+            cur.execute('''
+                UPDATE purchases
+                SET payment_id = %s, payment_url = %s
+                WHERE id = %s
+            ''', (payment['id'], payment_url, purchase_id))
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+        return json_response(200, {
+            'payment_id': payment['id'],
+            'payment_url': payment_url,
+            'purchase_id': purchase_id,
+            'status': payment.get('status')
+        })
+
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': f'Internal error: {str(e)}'})
-        }
\ No newline at end of file
+        return error_response(500, f'Internal error: {str(e)}')
@@ -0,0 +1,89 @@
+'''
+Business: Verify read/write connection routing against two local PostgreSQL instances
+Args: --primary-url, --replica-url (default DATABASE_URL / DATABASE_REPLICA_URL), --max-lag
+      e.g. a primary on :5432 and a streaming standby on :5433 (pg_basebackup -R), or any second server
+Returns: prints where primary and read connections land and checks the lag and outage fallbacks; exit 1 on mismatch
+'''
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+
+
+def server_of(conn) -> str:
+    cur = conn.cursor()
+    cur.execute('SELECT inet_server_port(), pg_is_in_recovery(), current_setting(\'transaction_read_only\')')
+    port, in_recovery, read_only = cur.fetchone()
+    cur.close()
+    conn.rollback()
+    return f'port={port} standby={in_recovery} read_only={read_only}'
+
+
+def configure(primary: str, replica: str, max_lag: float) -> None:
+    import db
+    import runtime
+
+    os.environ['DATABASE_URL'] = primary
+    os.environ['DATABASE_REPLICA_URL'] = replica
+    os.environ['REPLICA_MAX_LAG_SECONDS'] = str(max_lag)
+    runtime.get_config.cache_clear()
+    db._replica_checked_at = float('-inf')
+    db._replica_lag = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--primary-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--replica-url', default=os.environ.get('DATABASE_REPLICA_URL'))
+    parser.add_argument('--max-lag', type=float, default=5)
+    args = parser.parse_args()
+    if not args.primary_url or not args.replica_url:
+        parser.error('both primary and replica DSNs are required')
+
+    import db
+
+    failures = 0
+
+    def check(label: str, conn, expected_dsn: str) -> None:
+        nonlocal failures
+        actual = server_of(conn)
+        wanted = server_of(db.connect(expected_dsn))
+        verdict = 'ok' if actual.split()[0] == wanted.split()[0] else 'MISMATCH'
+        failures += verdict != 'ok'
+        print(f'{label:<34}{actual:<48}{verdict}')
+        conn.close()
+
+    configure(args.primary_url, args.replica_url, args.max_lag)
+    check('write -> primary', db.connect(args.primary_url), args.primary_url)
+    lag = db.replica_lag(db.connect(args.replica_url))
+    # inf: the standby is not streaming (or the role lacks pg_read_all_stats), so its freshness is unknown
+    print(f'measured replica lag: {lag:.3f}s (threshold {args.max_lag}s)')
+    expected = args.replica_url if lag <= args.max_lag else args.primary_url
+    check('read -> replica unless lagging', db.connect_read(), expected)
+
+    configure(args.primary_url, args.replica_url, -1)
+    check('read, lag over threshold', db.connect_read(), args.primary_url)
+
+    # A non-routable address drops packets instead of refusing, so only the connect timeout ends it
+    configure(args.primary_url, 'postgresql://10.255.255.1:5432/unreachable', args.max_lag)
+    started = time.monotonic()
+    check('read, replica unreachable', db.connect_read(), args.primary_url)
+    elapsed = time.monotonic() - started
+    print(f'unreachable replica fell back after {elapsed:.1f}s (REPLICA_CONNECT_TIMEOUT {db.REPLICA_CONNECT_TIMEOUT}s)')
+    failures += elapsed > db.REPLICA_CONNECT_TIMEOUT + 1
+
+    # Within REPLICA_RETRY_SECONDS the replica is not tried again, so this read must not wait
+    started = time.monotonic()
+    check('read, replica retry backoff', db.connect_read(), args.primary_url)
+    elapsed = time.monotonic() - started
+    print(f'next read fell back after {elapsed:.1f}s (REPLICA_RETRY_SECONDS {db.REPLICA_RETRY_SECONDS:g}s)')
+    failures += elapsed > 0.5
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
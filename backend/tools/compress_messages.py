@@ -0,0 +1,90 @@
+'''
+Business: Background job converting existing messages.content rows to compressed content_z in batches
+Args: --database-url, --codec zlib|zstd, --batch, --pause (seconds between batches), --start-id, --dry-run
+Returns: progress lines and totals of raw vs stored bytes; safe to stop and rerun at any point
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared'))
+import msgcodec
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--codec', choices=['zlib', 'zstd'], default='zlib')
+    parser.add_argument('--batch', type=int, default=2000)
+    parser.add_argument('--pause', type=float, default=0.05, help='throttle so chat traffic keeps priority')
+    parser.add_argument('--start-id', type=int, default=0)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    codec = msgcodec.CODEC_ZSTD if args.codec == 'zstd' else msgcodec.CODEC_ZLIB
+    if codec == msgcodec.CODEC_ZSTD and msgcodec.zstandard is None:
+        parser.error('zstandard is not installed')
+
+    conn = psycopg2.connect(args.database_url)
+    cur = conn.cursor()
+    cur.execute("SELECT pg_total_relation_size('messages')")
+    size_before = cur.fetchone()[0]
+
+    last_id = args.start_id
+    raw_total = stored_total = converted = 0
+    started = time.perf_counter()
+    while True:
+        # Guest rows (user_id = 0) are matched by content prefix and must stay plain text
+        cur.execute(
+            'SELECT id, content FROM messages WHERE id > %s AND user_id <> 0 AND content_z IS NULL '
+            'AND octet_length(content) >= %s ORDER BY id LIMIT %s',
+            (last_id, msgcodec.MIN_BYTES, args.batch)
+        )
+        rows = cur.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        updates = []
+        for message_id, content in rows:
+            raw = len(content.encode('utf-8'))
+            blob = msgcodec.compress(content, codec)
+            raw_total += raw
+            if len(blob) < raw:
+                updates.append((message_id, blob))
+                stored_total += len(blob)
+            else:
+                stored_total += raw
+
+        if updates and not args.dry_run:
+            execute_values(
+                cur,
+                'UPDATE messages AS m SET content_z = v.z, content = NULL '
+                'FROM (VALUES %s) AS v(id, z) WHERE m.id = v.id AND m.content_z IS NULL',
+                updates,
+                template='(%s, %s::bytea)'
+            )
+        conn.commit()
+        converted += len(updates)
+        print(f'up to id {last_id}: {converted} rows converted, '
+              f'{raw_total} -> {stored_total} bytes', flush=True)
+        time.sleep(args.pause)
+
+    elapsed = time.perf_counter() - started
+    ratio = stored_total / raw_total if raw_total else 1
+    print(f'done in {elapsed:.1f}s: {converted} rows, payload {raw_total} -> {stored_total} bytes '
+          f'({(1 - ratio) * 100:.1f}% saved)')
+    if not args.dry_run:
+        cur.execute("SELECT pg_total_relation_size('messages')")
+        # Freed space is reused by new rows; VACUUM FULL is needed to hand it back to the OS
+        print(f'messages relation: {size_before} -> {cur.fetchone()[0]} bytes before vacuum')
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
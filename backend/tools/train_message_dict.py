@@ -0,0 +1,62 @@
+'''
+Business: Build a shared preset dictionary for message compression from real assistant replies
+Args: --database-url, --version (writes shared/message_dict_v<version>.txt, must be a new version), --sample, --size
+Returns: dictionary file usable by both zlib (zdict) and zstd (raw-content dictionary)
+'''
+
+import argparse
+import os
+import re
+from collections import Counter
+
+import psycopg2
+
+SHARED_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--version', type=int, required=True)
+    parser.add_argument('--sample', type=int, default=20000)
+    parser.add_argument('--size', type=int, default=32768, help='zlib can only use the last 32 KiB')
+    args = parser.parse_args()
+
+    # Stored rows name their dictionary by version only; rewriting one would make them undecodable
+    path = os.path.join(SHARED_DIR, f'message_dict_v{args.version}.txt')
+    if args.version < 1 or os.path.exists(path):
+        parser.error(f'dictionary version {args.version} already exists or is invalid; pick a new version')
+
+    conn = psycopg2.connect(args.database_url)
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT content FROM messages TABLESAMPLE SYSTEM (10) "
+        "WHERE role = 'assistant' AND user_id <> 0 AND content IS NOT NULL LIMIT %s",
+        (args.sample,)
+    )
+    phrases: Counter = Counter()
+    for (content,) in cur.fetchall():
+        for phrase in re.split(r'(?<=[.!?:\n])\s+', content):
+            phrase = phrase.strip()
+            if 8 <= len(phrase) <= 200:
+                phrases[phrase] += 1
+    conn.close()
+
+    # Score by bytes saved if the phrase is referenced; most valuable phrases go last,
+    # nearest to the data, because deflate prefers short match distances
+    ranked = sorted((p for p, n in phrases.items() if n > 1), key=lambda p: phrases[p] * len(p.encode('utf-8')))
+    chosen, size = [], 0
+    for phrase in reversed(ranked):
+        encoded = len(phrase.encode('utf-8')) + 1
+        if size + encoded > args.size:
+            break
+        chosen.append(phrase)
+        size += encoded
+
+    with open(path, 'x', encoding='utf-8') as f:
+        f.write(' '.join(reversed(chosen)))
+    print(f'wrote {path}: {len(chosen)} phrases, {size} bytes; run tools/vendor_shared.py before deploying')
+
+
+if __name__ == '__main__':
+    main()
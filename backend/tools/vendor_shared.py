@@ -0,0 +1,113 @@
+'''
+Business: Copy the backend/shared modules each function imports into that function's directory
+Args: --check only reports functions whose shared/ copy differs from what they need (exit 1)
+Returns: list of updated or out-of-date functions
+
+The platform packages one function directory at a time, so each function imports runtime, db,
+tracing, ... from its own shared/ directory. Only the modules a function's index.py imports
+(anywhere in the file, including lazy imports) are copied, plus the shared modules those import
+and their data files. backend/shared is the only place to edit; the pre-commit hook and CI run
+--check so a stale copy cannot be committed.
+'''
+
+import argparse
+import ast
+import filecmp
+import os
+import shutil
+import sys
+from typing import Dict, List, Set
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHARED_DIR = os.path.join(BACKEND_DIR, 'shared')
+VENDORED = ('.py', '.txt')
+# Non-Python files read by a shared module at runtime, by file name prefix
+DATA_FILES: Dict[str, str] = {'msgcodec': 'message_dict_v'}
+
+
+def functions() -> List[str]:
+    return sorted(name for name in os.listdir(BACKEND_DIR)
+                  if os.path.isfile(os.path.join(BACKEND_DIR, name, 'index.py')))
+
+
+def shared_modules() -> Set[str]:
+    return {name[:-3] for name in os.listdir(SHARED_DIR) if name.endswith('.py')}
+
+
+def imported_names(path: str) -> Set[str]:
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split('.')[0])
+    return names
+
+
+def required_files(function: str) -> List[str]:
+    available = shared_modules()
+    pending = list(imported_names(os.path.join(BACKEND_DIR, function, 'index.py')) & available)
+    modules: Set[str] = set()
+    while pending:
+        module = pending.pop()
+        if module in modules:
+            continue
+        modules.add(module)
+        pending.extend(imported_names(os.path.join(SHARED_DIR, f'{module}.py')) & available)
+
+    files = {f'{module}.py' for module in modules}
+    for module, prefix in DATA_FILES.items():
+        if module in modules:
+            files.update(name for name in os.listdir(SHARED_DIR) if name.startswith(prefix))
+    return sorted(files)
+
+
+def present_files(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if name.endswith(VENDORED))
+
+
+def out_of_date(function: str) -> bool:
+    target = os.path.join(BACKEND_DIR, function, 'shared')
+    expected = required_files(function)
+    if present_files(target) != expected:
+        return True
+    _, mismatch, errors = filecmp.cmpfiles(SHARED_DIR, target, expected, shallow=False)
+    return bool(mismatch or errors)
+
+
+def vendor(function: str) -> None:
+    target = os.path.join(BACKEND_DIR, function, 'shared')
+    expected = required_files(function)
+    for name in present_files(target):
+        if name not in expected:
+            os.remove(os.path.join(target, name))
+    if not expected:
+        shutil.rmtree(target, ignore_errors=True)
+        return
+    os.makedirs(target, exist_ok=True)
+    for name in expected:
+        shutil.copyfile(os.path.join(SHARED_DIR, name), os.path.join(target, name))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--check', action='store_true')
+    args = parser.parse_args()
+
+    stale = [name for name in functions() if out_of_date(name)]
+    if args.check:
+        for name in stale:
+            print(f'{name}/shared is out of date: run backend/tools/vendor_shared.py')
+        sys.exit(1 if stale else 0)
+
+    for name in stale:
+        vendor(name)
+        print(f'updated {name}/shared: {", ".join(required_files(name)) or "nothing"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,92 +4,94 @@ Args: event with httpMethod, body containing username, password, action (registe
 Returns: HTTP response with JWT token or error
 '''
 
-import json
 import os
+import sys
 import bcrypt
 import jwt
 from datetime import datetime, timedelta
 from typing import Dict, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
 
+# Vendored copy of backend/shared (tools/vendor_shared.py): each function is deployed on its own
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared'))
+from runtime import (cors_headers, preflight, json_response, error_response,
+                     method_not_allowed, parse_body, get_config)
+from db import connect
+from profiling import profiled
+from tracing import traced, span, cursor_factory
+
+CORS_HEADERS = cors_headers('GET, POST, OPTIONS', 'Content-Type, X-User-Token')
+
+
+def _issue_token(user: Dict[str, Any]) -> Dict[str, Any]:
+    token = jwt.encode(
+        {
+            'user_id': user['id'],
+            'username': user['username'],
+            'exp': datetime.utcnow() + timedelta(days=30)
+        },
+        get_config().jwt_secret,
+        algorithm='HS256'
+    )
+
+    return json_response(200, {
+        'token': token,
+        'user': {
+            'id': user['id'],
+            'username': user['username'],
+            'full_name': user['full_name'],
+            'email': user['email']
+        }
+    })
+
+
+@profiled('user-auth')
+@traced('user-auth')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
-    
+
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
-    
+        return preflight(CORS_HEADERS)
+
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
-    
+        return method_not_allowed()
+
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = parse_body(event)
         action = body.get('action')
         username = body.get('username', '').strip()
         password = body.get('password', '')
-        
+
         if not username or not password:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Логин и пароль обязательны'})
-            }
-        
-        dsn = os.environ.get('DATABASE_URL')
+            return error_response(400, 'Логин и пароль обязательны')
+
+        dsn = get_config().database_url
         if not dsn:
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Database not configured'})
-            }
-        
-        conn = psycopg2.connect(dsn)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
+            return error_response(500, 'Database not configured')
+
+        conn = connect(dsn)
+        cursor = conn.cursor(cursor_factory=cursor_factory(RealDictCursor))
+
         if action == 'register':
             full_name = body.get('full_name', '').strip()
             email = body.get('email', '').strip()
-            
+
             if len(username) < 3:
                 conn.close()
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Логин должен быть не менее 3 символов'})
-                }
-            
+                return error_response(400, 'Логин должен быть не менее 3 символов')
+
             if len(password) < 6:
                 conn.close()
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Пароль должен быть не менее 6 символов'})
-                }
-            
+                return error_response(400, 'Пароль должен быть не менее 6 символов')
+
             cursor.execute("SELECT id FROM users WHERE username = %s", (username,))
             if cursor.fetchone():
                 conn.close()
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Пользователь с таким логином уже существует'})
-                }
-            
-            password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            
+                return error_response(400, 'Пользователь с таким логином уже существует')
+
+            with span('bcrypt'):
+                password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
             cursor.execute(
                 "INSERT INTO users (username, password_hash, full_name, email) VALUES (%s, %s, %s, %s) RETURNING id, username, full_name, email, created_at",
                 (username, password_hash, full_name, email)
@@ -97,32 +99,9 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             user = cursor.fetchone()
             conn.commit()
             conn.close()
-            
-            jwt_secret = os.environ.get('JWT_SECRET', 'default-secret-change-in-production')
-            token = jwt.encode(
-                {
-                    'user_id': user['id'],
-                    'username': user['username'],
-                    'exp': datetime.utcnow() + timedelta(days=30)
-                },
-                jwt_secret,
-                algorithm='HS256'
-            )
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'token': token,
-                    'user': {
-                        'id': user['id'],
-                        'username': user['username'],
-                        'full_name': user['full_name'],
-                        'email': user['email']
-                    }
-                })
-            }
-        
+
+            return _issue_token(user)
+
         elif action == 'login':
             cursor.execute(
                 "SELECT id, username, password_hash, full_name, email FROM users WHERE username = %s",
@@ -130,56 +109,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             )
             user = cursor.fetchone()
             conn.close()
-            
-            if not user:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Неверный логин или пароль'})
-                }
-            
-            if not bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8')):
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Неверный логин или пароль'})
-                }
-            
-            jwt_secret = os.environ.get('JWT_SECRET', 'default-secret-change-in-production')
-            token = jwt.encode(
-                {
-                    'user_id': user['id'],
-                    'username': user['username'],
-                    'exp': datetime.utcnow() + timedelta(days=30)
-                },
-                jwt_secret,
-                algorithm='HS256'
-            )
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'token': token,
-                    'user': {
-                        'id': user['id'],
-                        'username': user['username'],
-                        'full_name': user['full_name'],
-                        'email': user['email']
-                    }
-                })
-            }
-        
+
+            # Accounts imported from the legacy schema have no password ('!') and cannot log in
+            if not user or not user['password_hash'].startswith('$2'):
+                return error_response(401, 'Неверный логин или пароль')
+
+            with span('bcrypt'):
+                password_ok = bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8'))
+
+            if not password_ok:
+                return error_response(401, 'Неверный логин или пароль')
+
+            return _issue_token(user)
+
         else:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Invalid action. Use "register" or "login"'})
-            }
-    
+            conn.close()
+            return error_response(400, 'Invalid action. Use "register" or "login"')
+
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': f'Server error: {str(e)}'})
-        }
\ No newline at end of file
+        return error_response(500, f'Server error: {str(e)}')
@@ -0,0 +1,188 @@
+'''
+Business: Per-process PostgreSQL connection reuse and read/write routing for backend functions
+Args: DB_POOL_SIZE idle connections kept per DSN (default 0 - plain connect/close),
+      DB_POOL_MAX_IDLE_SECONDS drops idle connections older than this (default 60),
+      DATABASE_REPLICA_URL / REPLICA_MAX_LAG_SECONDS via runtime.Config,
+      REPLICA_LAG_CHECK_SECONDS how long a measured replica lag is trusted (default 2),
+      REPLICA_CONNECT_TIMEOUT seconds before an unreachable replica falls back (default 2,
+      rounded up to whole seconds for libpq), REPLICA_RETRY_SECONDS how long reads stay on the
+      primary after the replica could not be reached (default 30)
+Returns: connect(dsn) - a psycopg2 connection whose close() hands it back to the pool,
+         connect_read() - read-only connection to the replica, or to the primary when the
+         replica is missing, unreachable or lagging
+'''
+
+import math
+import os
+import time
+from typing import Dict, List, Tuple, Any, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+from runtime import get_config
+from tracing import span, count
+
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0'))
+MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE_SECONDS', '60'))
+LAG_CHECK_SECONDS = float(os.environ.get('REPLICA_LAG_CHECK_SECONDS', '2'))
+# libpq only accepts whole seconds
+REPLICA_CONNECT_TIMEOUT = max(1, math.ceil(float(os.environ.get('REPLICA_CONNECT_TIMEOUT', '2'))))
+REPLICA_RETRY_SECONDS = float(os.environ.get('REPLICA_RETRY_SECONDS', '30'))
+
+# A streaming replica that replayed everything it received is current even when no writes
+# happened for a while. Without a streaming WAL receiver replay soon catches up with the last
+# received LSN and would look current forever, so that state is reported as unknown (NULL).
+# Reading pg_stat_wal_receiver.status needs pg_read_all_stats (or pg_monitor) on the replica;
+# without it the status is NULL and reads stay on the primary.
+LAG_QUERY = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+'''
+
+# dsn -> [(connection, released_at)], owned by the process that created it
+_idle: Dict[str, List[Tuple['PooledConnection', float]]] = {}
+_owner_pid = os.getpid()
+
+# Last measured replica lag in seconds; None means the replica was unreachable
+_replica_lag: Optional[float] = None
+_replica_checked_at = float('-inf')
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    '''Connection that returns to the idle list on close() instead of disconnecting.'''
+
+    pool_dsn: Any = None
+
+    def close(self) -> None:
+        if self.pool_dsn is None or self.closed:
+            return super().close()
+        try:
+            if self.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self.rollback()
+        except psycopg2.Error:
+            return super().close()
+        _release(self)
+
+    def disconnect(self) -> None:
+        self.pool_dsn = None
+        super().close()
+
+
+def _reset_after_fork() -> None:
+    # Sockets inherited from the parent must never be used by a forked worker
+    global _owner_pid
+    if os.getpid() != _owner_pid:
+        _idle.clear()
+        _owner_pid = os.getpid()
+
+
+def _release(conn: PooledConnection) -> None:
+    _reset_after_fork()
+    idle = _idle.setdefault(conn.pool_dsn, [])
+    if len(idle) >= POOL_SIZE:
+        conn.disconnect()
+        return
+    idle.append((conn, time.monotonic()))
+
+
+def _discard(conn: Any) -> None:
+    if isinstance(conn, PooledConnection):
+        conn.disconnect()
+    else:
+        conn.close()
+
+
+def _acquire(dsn: str, **connect_kwargs: Any) -> Any:
+    if POOL_SIZE <= 0:
+        with span('db_connect'):
+            return psycopg2.connect(dsn, **connect_kwargs)
+
+    _reset_after_fork()
+    idle = _idle.get(dsn)
+    now = time.monotonic()
+    while idle:
+        conn, released_at = idle.pop()
+        if conn.closed or now - released_at >= MAX_IDLE_SECONDS:
+            conn.disconnect()
+            continue
+        try:
+            # Reads whatever the server sent while the connection sat idle, without a round trip:
+            # a server-side close (restart, idle timeout) raises here instead of in the handler
+            conn.poll()
+        except psycopg2.Error:
+            count('db_stale')
+            conn.disconnect()
+            continue
+        return conn
+
+    with span('db_connect'):
+        conn = psycopg2.connect(dsn, connection_factory=PooledConnection, **connect_kwargs)
+    conn.pool_dsn = dsn
+    return conn
+
+
+def connect(dsn: str, readonly: bool = False, **connect_kwargs: Any) -> Any:
+    conn = _acquire(dsn, **connect_kwargs)
+    # Sent with the next BEGIN, so switching a pooled connection costs no round trip
+    conn.readonly = True if readonly else None
+    return conn
+
+
+def replica_lag(conn: Any) -> float:
+    cur = conn.cursor()
+    try:
+        cur.execute(LAG_QUERY)
+        lag = cur.fetchone()[0]
+        return float('inf') if lag is None else float(lag)
+    finally:
+        cur.close()
+        conn.rollback()
+
+
+def connect_read() -> Any:
+    '''
+    Connection for analytics and history reads. The replica lag is re-measured at most
+    every LAG_CHECK_SECONDS; above REPLICA_MAX_LAG_SECONDS, or when the replica cannot be
+    reached within REPLICA_CONNECT_TIMEOUT, reads go to the primary (still read-only)
+    until the next check. An unreachable replica is retried only after REPLICA_RETRY_SECONDS,
+    so an outage costs one connect timeout per process and interval, not one per check.
+    '''
+    global _replica_lag, _replica_checked_at
+    config = get_config()
+    replica_dsn = config.database_replica_url
+
+    if replica_dsn:
+        now = time.monotonic()
+        stale = now - _replica_checked_at >= LAG_CHECK_SECONDS
+        if stale or (_replica_lag is not None and _replica_lag <= config.replica_max_lag_seconds):
+            conn = None
+            try:
+                conn = connect(replica_dsn, readonly=True, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+                if stale:
+                    _replica_lag = replica_lag(conn)
+                    _replica_checked_at = now
+                if _replica_lag <= config.replica_max_lag_seconds:
+                    count('db_replica')
+                    return conn
+                conn.close()
+            except psycopg2.Error:
+                if conn is not None:
+                    _discard(conn)
+                _replica_lag = None
+                # Treated as checked until the retry interval has passed
+                _replica_checked_at = time.monotonic() + max(0.0, REPLICA_RETRY_SECONDS - LAG_CHECK_SECONDS)
+
+    count('db_primary_read')
+    return connect(config.database_url, readonly=True)
+
+
+def close_all() -> None:
+    for idle in _idle.values():
+        for conn, _ in idle:
+            conn.disconnect()
+    _idle.clear()
@@ -0,0 +1,7 @@
+-- Ключ идемпотентности платежа: строка покупки создаётся до обращения к ЮKassa.
+-- Ключ задаёт клиент, поэтому он уникален только в пределах пользователя
+ALTER TABLE purchases
+ADD COLUMN IF NOT EXISTS idempotence_key VARCHAR(64),
+ADD COLUMN IF NOT EXISTS payment_url TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_purchases_user_idempotence_key ON purchases(user_id, idempotence_key);
@@ -0,0 +1,2 @@
+-- Индекс для keyset-пагинации истории чата по (user_id, id)
+CREATE INDEX IF NOT EXISTS idx_messages_user_id_id ON messages(user_id, id);
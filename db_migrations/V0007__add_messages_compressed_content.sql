@@ -0,0 +1,7 @@
+-- Сжатое хранение текста сообщений: content_z содержит заголовок кодека и сжатые байты
+ALTER TABLE messages
+ADD COLUMN IF NOT EXISTS content_z BYTEA,
+ALTER COLUMN content DROP NOT NULL;
+
+ALTER TABLE messages
+ADD CONSTRAINT messages_content_present CHECK (content IS NOT NULL OR content_z IS NOT NULL);
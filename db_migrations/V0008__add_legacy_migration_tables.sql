@@ -0,0 +1,20 @@
+-- Перенос данных из схемы t_p94602577_ai_helper_website: соответствие строковых user_id новым users.id,
+-- контрольные точки для возобновления и исходные id строк для повторных запусков и сверки
+CREATE TABLE IF NOT EXISTS legacy_user_map (
+    legacy_user_id VARCHAR(255) PRIMARY KEY,
+    user_id INTEGER NOT NULL UNIQUE,
+    orphan BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS migration_checkpoints (
+    table_name VARCHAR(64) PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    rows_copied BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS legacy_id INTEGER;
+ALTER TABLE purchases ADD COLUMN IF NOT EXISTS legacy_id INTEGER;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_legacy_id ON messages(legacy_id) WHERE legacy_id IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_purchases_legacy_id ON purchases(legacy_id) WHERE legacy_id IS NOT NULL;